@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import platform
+import random
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+import client
+from bot import random_placements
+from client_state import apply_server_message
+from placement import PlacementValidator
+
+BOARD_SIZES = (8, 10, 12, 20, 30)
+SCENES = ('placement', 'game', 'game_cold')
+FRAME_DT = 1000 // client.ACTIVE_FPS
+
+
+def setup_scene(scene, board_size, rng):
+    """
+    Ustawia client_game_state tak, jakby klient dostał komplet wiadomości z serwera:
+    rozmieszczanie z połową floty na planszy albo gra z ~30% ostrzelanych pól.
+    """
+    state = client.client_game_state
+    ships = [5, 4, 3, 3, 2] * max(1, board_size // 8)
+    placements = random_placements(board_size, ships, rng) or []
+    apply_server_message(state, {'status': 'start_placement', 'your_name': 'bench', 'opponent_name': 'rival',
+                                 'board_size': board_size, 'ships_to_place': ships}, None, client.screen_events)
+    if scene == 'placement':
+        validator = state['placement_validator']
+        for ship in placements[:len(placements) // 2]:
+            row, col = ship['start_pos']
+            validator.place(validator.ship_mask(row, col, ship['size'], ship['orientation']))
+            state['current_placing_ship_index'] += 1
+        return
+
+    validator = PlacementValidator(board_size)
+    for ship in placements:
+        row, col = ship['start_pos']
+        validator.place(validator.ship_mask(row, col, ship['size'], ship['orientation']))
+    my_board = [['S' if validator.occupied >> (r * board_size + c) & 1 else '.' for c in range(board_size)]
+                for r in range(board_size)]
+    apply_server_message(state, {'status': 'game_start', 'your_turn': True, 'my_initial_board': my_board},
+                         None, client.screen_events)
+    for r in range(board_size):
+        for c in range(board_size):
+            if rng.random() < 0.3:
+                state['opponent_board_view'][r][c] = 'H' if rng.random() < 0.3 else 'M'
+            if rng.random() < 0.3:
+                my_board[r][c] = 'X' if my_board[r][c] == 'S' else 'O'
+    client.invalidate_boards()
+
+
+def run_scene(scene, board_size, frames, rng):
+    setup_scene(scene, board_size, rng)
+    profiler = client.FrameProfiler(window=frames)
+    client.profiler = profiler
+    place_button = client.Button(client.SCREEN_WIDTH // 2 - 100, client.SCREEN_HEIGHT - 70, 200, 50,
+                                 "Confirm", "confirm_placement")
+    mouse_pos = (client.SCREEN_WIDTH * 3 // 4, client.SCREEN_HEIGHT // 3)
+    time_elapsed = 0
+    started = time.perf_counter()
+    for _ in range(frames):
+        time_elapsed += FRAME_DT
+        if scene == 'game_cold':
+            client.invalidate_boards()
+        profiler.begin_frame()
+        if scene == 'placement':
+            client.draw_placement_screen(mouse_pos, time_elapsed, place_button)
+        else:
+            client.draw_game_screen(mouse_pos, time_elapsed)
+        profiler.mark('other')
+        pygame.display.flip()
+        profiler.mark('flip')
+        profiler.end_frame()
+    elapsed = time.perf_counter() - started
+    return {
+        'scene': scene,
+        'board_size': board_size,
+        'frames': frames,
+        'fps': round(frames / elapsed, 1),
+        'frame_ms': round(profiler.average_ms(), 3),
+        'stages_ms': {stage: round(profiler.average_ms(stage), 3) for stage in profiler.STAGES},
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offscreen client frame-time benchmark (SDL dummy video driver).")
+    parser.add_argument('--board-sizes', type=int, nargs='+', default=list(BOARD_SIZES))
+    parser.add_argument('--scenes', nargs='+', choices=SCENES, default=list(SCENES))
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--background', choices=('animated', 'static'), default=client.BACKGROUND_MODE)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write JSON results to this file")
+    args = parser.parse_args()
+
+    client.background.mode = args.background
+    rng = random.Random(args.seed)
+    results = []
+    for scene in args.scenes:
+        for board_size in args.board_sizes:
+            row = run_scene(scene, board_size, args.frames, rng)
+            results.append(row)
+            stages = '  '.join(f"{stage} {ms:.2f}" for stage, ms in row['stages_ms'].items() if ms)
+            print(f"{scene:<10} {board_size:>3}x{board_size:<3} {row['fps']:>8.1f} fps  {row['frame_ms']:6.2f} ms/frame  ({stages})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'benchmark': 'client_frames',
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'video_driver': pygame.display.get_driver(),
+                'background': args.background,
+                'results': results,
+            }, f, indent=2)
+            f.write('\n')
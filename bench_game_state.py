@@ -0,0 +1,138 @@
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import pickle
+import platform
+import random
+import statistics
+import tempfile
+import time
+import timeit
+
+from bot import random_placements
+from main import GAME_CONFIG, GameState, Scoreboard
+
+SYNTHETIC_CONFIG = {
+    'synthetic_50': {'board_size': 50, 'ships': [5, 4, 4, 3, 3, 3, 2, 2, 2, 2] * 8},
+    'synthetic_100': {'board_size': 100, 'ships': [5, 4, 4, 3, 3, 3, 2, 2, 2, 2] * 30},
+}
+SCOREBOARD_SIZES = (10, 1000, 10000)
+REPEAT = 5
+
+
+def summarize(per_op_seconds):
+    return {
+        'best_us': round(min(per_op_seconds) * 1e6, 3),
+        'median_us': round(statistics.median(per_op_seconds) * 1e6, 3),
+    }
+
+
+def time_call(func, repeat=REPEAT):
+    """
+    Czas jednego wywołania func (w sekundach) dla `repeat` powtórzeń,
+    z liczbą wywołań w powtórzeniu dobraną przez timeit.autorange.
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return [total / number for total in timer.repeat(repeat, number)]
+
+
+def new_game(config_name, scoreboard):
+    game_state = GameState(scoreboard)
+    for player_id, name in ((1, 'alpha'), (2, 'beta')):
+        game_state.players[player_id] = {'conn': None, 'addr': None, 'name': name, 'difficulty': config_name,
+                                         'ready_to_play': False, 'restart_requested': False}
+    game_state.prepare_new_game()
+    return game_state
+
+
+def bench_place_ship(config_name, scoreboard, rng):
+    game_state = new_game(config_name, scoreboard)
+    config = GAME_CONFIG[config_name]
+    placements = random_placements(config['board_size'], config['ships'], rng)
+    return time_call(lambda: game_state.place_ship(1, placements))
+
+
+def bench_process_shot(config_name, scoreboard, rng):
+    config = GAME_CONFIG[config_name]
+    cells = [(r, c) for r in range(config['board_size']) for c in range(config['board_size'])]
+    per_shot = []
+    for _ in range(REPEAT):
+        game_state = new_game(config_name, scoreboard)
+        for player_id in (1, 2):
+            game_state.place_ship(player_id, random_placements(config['board_size'], config['ships'], rng))
+        rng.shuffle(cells)
+        shots = 0
+        started = time.perf_counter()
+        for row, col in cells:
+            shots += 1
+            if game_state.process_shot(1, row, col)['game_over']:
+                break
+        per_shot.append((time.perf_counter() - started) / shots)
+    return per_shot
+
+
+def bench_prepare_new_game(config_name, scoreboard, rng):
+    game_state = new_game(config_name, scoreboard)
+    return time_call(game_state.prepare_new_game)
+
+
+def bench_add_win(entries, workdir, rng):
+    path = os.path.join(workdir, f'scoreboard_{entries}.pkl')
+    with open(path, 'wb') as f:
+        pickle.dump([{'name': f'player{i}', 'wins': rng.randrange(1, 100)} for i in range(entries)], f)
+    scoreboard = Scoreboard(path)
+    names = itertools.cycle([f'player{rng.randrange(entries)}' for _ in range(1000)])
+    try:
+        return time_call(lambda: scoreboard.add_win(next(names)))
+    finally:
+        scoreboard.close()
+
+
+def run_benchmarks(configs, seed=0):
+    rng = random.Random(seed)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir, open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        scoreboard = Scoreboard(os.path.join(workdir, 'scoreboard.pkl'))
+        for config_name in configs:
+            size = GAME_CONFIG[config_name]['board_size']
+            for name, bench in (('place_ship', bench_place_ship), ('process_shot', bench_process_shot),
+                                ('prepare_new_game', bench_prepare_new_game)):
+                results.append(dict(benchmark=name, config=config_name, board_size=size,
+                                    **summarize(bench(config_name, scoreboard, rng))))
+        for entries in SCOREBOARD_SIZES:
+            results.append(dict(benchmark='add_win_to_scoreboard', scoreboard_entries=entries,
+                                **summarize(bench_add_win(entries, workdir, rng))))
+        scoreboard.close()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for GameState hot paths.")
+    parser.add_argument('--configs', nargs='+', choices=sorted(set(GAME_CONFIG) | set(SYNTHETIC_CONFIG)),
+                        default=list(GAME_CONFIG) + list(SYNTHETIC_CONFIG))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write JSON results to this file")
+    args = parser.parse_args()
+
+    GAME_CONFIG.update(SYNTHETIC_CONFIG)
+    results = run_benchmarks(args.configs, args.seed)
+
+    for row in results:
+        label = row.get('config') or f"{row['scoreboard_entries']} entries"
+        print(f"{row['benchmark']:<24} {label:<16} best {row['best_us']:>12.3f} us   median {row['median_us']:>12.3f} us")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'benchmark': 'game_state',
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'seed': args.seed,
+                'results': results,
+            }, f, indent=2)
+            f.write('\n')
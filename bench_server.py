@@ -0,0 +1,255 @@
+import argparse
+import json
+import math
+import os
+import platform
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bot import DIFFICULTIES, HOST, BotPlayer, run_bots
+from protocol import PROTOCOL_VERSION
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+SERVER_START_TIMEOUT = 10
+EXPECTED_RESPONSES = {
+    'set_player_info': ('waiting_for_other_player', 'start_placement', 'server_full', 'error'),
+    'place_ships': ('waiting_for_other_player', 'game_start', 'error'),
+    'shoot': ('shot_result', 'invalid_shot', 'error'),
+    'request_restart': ('message', 'start_placement', 'error'),
+}
+
+
+class CountingSocket:
+    """
+    Cienka nakładka na gniazdo licząca bajty wysłane i odebrane przez bota.
+    """
+    def __init__(self, sock):
+        self.sock = sock
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def sendall(self, data):
+        self.sock.sendall(data)
+        self.bytes_sent += len(data)
+
+    def recv_into(self, buffer):
+        received = self.sock.recv_into(buffer)
+        self.bytes_received += received
+        return received
+
+    def close(self):
+        self.sock.close()
+
+
+class MeasuredBot(BotPlayer):
+    """
+    Bot mierzący czas od wysłania akcji do pierwszej odpowiedzi serwera na nią oraz czas
+    zmiany tury: od wysłania strzału do zastosowania opponent_shot u przeciwnika.
+    Boty działają w jednym procesie, więc chwile strzałów dzielą przez shots_sent.
+    """
+    shots_sent = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = {action: [] for action in EXPECTED_RESPONSES}
+        self.turn_latencies = []
+        self.waiting_for = None
+        self.sent_at = 0
+
+    def connect(self):
+        return CountingSocket(super().connect())
+
+    def send(self, data):
+        action = data.get('action')
+        if action in EXPECTED_RESPONSES:
+            self.waiting_for = action
+            self.sent_at = time.perf_counter()
+            if action == 'shoot':
+                MeasuredBot.shots_sent[(self.name, data['row'], data['col'])] = self.sent_at
+        super().send(data)
+
+    def message_applied(self, state, status, response):
+        action = self.waiting_for
+        if action is not None and status in EXPECTED_RESPONSES[action]:
+            self.latencies[action].append(time.perf_counter() - self.sent_at)
+            self.waiting_for = None
+        if status == 'opponent_shot':
+            sent_at = MeasuredBot.shots_sent.pop((state['opponent_name'], response['row'], response['col']), None)
+            if sent_at is not None:
+                self.turn_latencies.append(time.perf_counter() - sent_at)
+        super().message_applied(state, status, response)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def latency_summary(values):
+    values = sorted(values)
+    to_ms = lambda value: None if value is None else round(value * 1000, 3)
+    return {
+        'count': len(values),
+        'p50_ms': to_ms(percentile(values, 0.50)),
+        'p99_ms': to_ms(percentile(values, 0.99)),
+        'max_ms': to_ms(values[-1] if values else None),
+    }
+
+
+def process_usage(pid):
+    """
+    Czas CPU (user + system, w sekundach) i pamięć RSS procesu serwera z /proc.
+    Poza Linuksem zwraca None w miejsce niedostępnych wartości.
+    """
+    usage = {'cpu_seconds': None, 'rss_kb': None, 'peak_rss_kb': None}
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        ticks = os.sysconf('SC_CLK_TCK')
+        usage['cpu_seconds'] = (int(fields[11]) + int(fields[12])) / ticks
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    usage['rss_kb'] = int(line.split()[1])
+                elif line.startswith('VmHWM:'):
+                    usage['peak_rss_kb'] = int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return usage
+
+
+def process_tree_usage(pid):
+    """
+    Suma process_usage() serwera i jego bezpośrednich procesów potomnych (tryb --workers).
+    """
+    pids = [pid]
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            pids += [int(child) for child in f.read().split()]
+    except (OSError, ValueError):
+        pass
+    total = process_usage(pid)
+    for child in pids[1:]:
+        usage = process_usage(child)
+        for key, value in usage.items():
+            if value is not None and total[key] is not None:
+                total[key] += value
+    return total
+
+
+def start_server(mode, workdir, workers=1):
+    """
+    Uruchamia serwer i czeka najwyżej SERVER_START_TIMEOUT sekund na jego komunikat startowy.
+    Wyjście czyta osobny wątek, więc milczący serwer nie blokuje benchmarku.
+    """
+    process = subprocess.Popen(
+        [sys.executable, '-u', SERVER_SCRIPT, '--mode', mode, '--workers', str(workers)], cwd=workdir,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    lines = queue.Queue()
+    started = threading.Event()
+
+    def read_output():
+        for line in process.stdout:
+            if not started.is_set():
+                lines.put(line)
+        lines.put(None)
+
+    threading.Thread(target=read_output, daemon=True).start()
+    port = None
+    running = False
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while not running:
+        try:
+            line = lines.get(timeout=max(0, deadline - time.monotonic()))
+        except queue.Empty:
+            break
+        if line is None:
+            break
+        if line.startswith('Successfully bound to port'):
+            port = int(line.split()[-1])
+        running = line.startswith('Server running')
+    started.set()
+    if port is None or not running:
+        process.kill()
+        process.wait()
+        raise RuntimeError("Server did not start")
+    return process, port
+
+
+def run_benchmark(mode='threaded', pairs=50, games=2, difficulty='easy', timeout=300, seed=0, workers=1):
+    with tempfile.TemporaryDirectory() as workdir:
+        process, port = start_server(mode, workdir, workers)
+        MeasuredBot.shots_sent.clear()
+        try:
+            usage_before = process_tree_usage(process.pid)
+            started = time.perf_counter()
+            bots = run_bots(pairs * 2, games, difficulty, HOST, port, timeout, seed, MeasuredBot)
+            elapsed = time.perf_counter() - started
+            usage_after = process_tree_usage(process.pid)
+        finally:
+            process.terminate()
+            process.wait()
+
+    matches = sum(bot.games_played for bot in bots) // 2
+    latencies = {action: [] for action in EXPECTED_RESPONSES}
+    for bot in bots:
+        for action, values in bot.latencies.items():
+            latencies[action].extend(values)
+    latency = {action: latency_summary(values) for action, values in latencies.items()}
+    latency['all'] = latency_summary([value for values in latencies.values() for value in values])
+    latency['turn_transition'] = latency_summary([value for bot in bots for value in bot.turn_latencies])
+    cpu_seconds = None
+    if usage_before['cpu_seconds'] is not None and usage_after['cpu_seconds'] is not None:
+        cpu_seconds = round(usage_after['cpu_seconds'] - usage_before['cpu_seconds'], 3)
+
+    return {
+        'benchmark': 'server_load',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'protocol_version': PROTOCOL_VERSION,
+        'config': {'mode': mode, 'workers': workers, 'pairs': pairs, 'games_per_pair': games,
+                   'difficulty': difficulty, 'seed': seed},
+        'elapsed_seconds': round(elapsed, 3),
+        'bots_finished': sum(bot.finished.is_set() for bot in bots),
+        'bots_total': len(bots),
+        'matches': matches,
+        'matches_per_second': round(matches / elapsed, 3) if elapsed else None,
+        'shots': sum(bot.shots_fired for bot in bots),
+        'latency': latency,
+        'bytes_sent': sum(bot.sock.bytes_sent for bot in bots),
+        'bytes_received': sum(bot.sock.bytes_received for bot in bots),
+        'server_cpu_seconds': cpu_seconds,
+        'server_rss_kb': usage_after['rss_kb'],
+        'server_peak_rss_kb': usage_after['peak_rss_kb'],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load benchmark: full matches between headless bots against a local server.")
+    parser.add_argument('--mode', choices=('threaded', 'asyncio'), default='threaded')
+    parser.add_argument('--pairs', type=int, default=50, help="concurrent matches")
+    parser.add_argument('--games', type=int, default=2, help="games per pair (a restart between each)")
+    parser.add_argument('--difficulty', choices=DIFFICULTIES, default='easy')
+    parser.add_argument('--workers', type=int, default=1, help="server worker processes (main.py --workers)")
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.mode, args.pairs, args.games, args.difficulty, args.timeout, args.seed, args.workers)
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+        print(f"{results['matches']} matches, {results['matches_per_second']} matches/s, "
+              f"p99 {results['latency']['all']['p99_ms']} ms, "
+              f"turn transition p99 {results['latency']['turn_transition']['p99_ms']} ms -> {args.output}")
+    else:
+        print(report)
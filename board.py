@@ -0,0 +1,72 @@
+from array import array
+
+
+class Bitboard:
+    """
+    Plansza jednego gracza zapisana w maskach bitowych (bit = row * size + col).
+    Strzał, wykrywanie zatopienia i "wszystkie zatopione" to pojedyncze operacje na intach.
+    """
+    __slots__ = ('size', 'occupied', 'hits', 'misses', 'ship_masks', 'cell_ships')
+
+    def __init__(self, size):
+        self.size = size
+        self.occupied = 0
+        self.hits = 0
+        self.misses = 0
+        self.ship_masks = []
+        self.cell_ships = array('H', [0]) * (size * size)
+
+    def in_bounds(self, row, col):
+        return 0 <= row < self.size and 0 <= col < self.size
+
+    def bit(self, row, col):
+        return 1 << (row * self.size + col)
+
+    def add_ship(self, cells):
+        mask = 0
+        ship_number = len(self.ship_masks) + 1
+        for r, c in cells:
+            index = r * self.size + c
+            mask |= 1 << index
+            self.cell_ships[index] = ship_number
+        self.ship_masks.append(mask)
+        self.occupied |= mask
+        return mask
+
+    def is_occupied(self, row, col):
+        return bool(self.occupied >> (row * self.size + col) & 1)
+
+    def is_shot(self, row, col):
+        return bool((self.hits | self.misses) >> (row * self.size + col) & 1)
+
+    def shoot(self, row, col):
+        index = row * self.size + col
+        bit = 1 << index
+        if not self.occupied & bit:
+            self.misses |= bit
+            return False, False
+        self.hits |= bit
+        ship_mask = self.ship_masks[self.cell_ships[index] - 1]
+        return True, self.hits & ship_mask == ship_mask
+
+    def all_sunk(self):
+        return self.occupied & ~self.hits == 0
+
+    def to_rows(self):
+        rows = []
+        index = 0
+        occupied, hits, misses = self.occupied, self.hits, self.misses
+        for _ in range(self.size):
+            row = []
+            for _ in range(self.size):
+                if hits >> index & 1:
+                    row.append('X')
+                elif misses >> index & 1:
+                    row.append('O')
+                elif occupied >> index & 1:
+                    row.append('S')
+                else:
+                    row.append('.')
+                index += 1
+            rows.append(row)
+        return rows
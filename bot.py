@@ -0,0 +1,170 @@
+import argparse
+import random
+import socket
+import threading
+import time
+
+from client_state import ClientEvents, new_client_state, send_message, server_listener
+from placement import PlacementValidator
+
+HOST = '127.0.0.1'
+PORT = 65432
+DIFFICULTIES = ('easy', 'medium', 'hard')
+PLACEMENT_ATTEMPTS = 200
+
+
+def random_placements(board_size, ship_sizes, rng):
+    """
+    Losowe rozmieszczenie statków zgodne z zasadami serwera (bez stykania się).
+    Zwraca None, jeśli statki nie mieszczą się na planszy.
+    """
+    validator = PlacementValidator(board_size)
+    placements = []
+    for size in ship_sizes:
+        candidate = None
+        for _ in range(PLACEMENT_ATTEMPTS):
+            orientation = rng.choice(('horizontal', 'vertical'))
+            row, col = rng.randrange(board_size), rng.randrange(board_size)
+            mask = validator.ship_mask(row, col, size, orientation)
+            if validator.can_place(mask):
+                candidate = (row, col, orientation, mask)
+                break
+        if candidate is None:
+            options = []
+            for orientation in ('horizontal', 'vertical'):
+                for row in range(board_size):
+                    for col in range(board_size):
+                        mask = validator.ship_mask(row, col, size, orientation)
+                        if validator.can_place(mask):
+                            options.append((row, col, orientation, mask))
+            if not options:
+                return None
+            candidate = rng.choice(options)
+        row, col, orientation, mask = candidate
+        validator.place(mask)
+        placements.append({'size': size, 'orientation': orientation, 'start_pos': (row, col)})
+    return placements
+
+
+class BotPlayer(ClientEvents):
+    """
+    Gracz bez okna: używa tej samej maszyny stanów co client.py (client_state),
+    a zamiast kliknięć sam rozstawia statki, strzela w losowe pola i prosi o rewanż,
+    dopóki nie rozegra zadanej liczby gier.
+    """
+    def __init__(self, name, difficulty='easy', games=1, host=HOST, port=PORT, seed=None):
+        self.name = name
+        self.difficulty = difficulty
+        self.games = games
+        self.host = host
+        self.port = port
+        self.rng = random.Random(seed)
+        self.state = new_client_state()
+        self.sock = None
+        self.thread = None
+        self.games_played = 0
+        self.shots_fired = 0
+        self.shot_pending = False
+        self.targets = []
+        self.finished = threading.Event()
+
+    def connect(self):
+        return socket.create_connection((self.host, self.port))
+
+    def send(self, data):
+        send_message(self.sock, data, self.state)
+
+    def start(self):
+        self.sock = self.connect()
+        self.state['server_connection'] = self.sock
+        self.state['player_name'] = self.name
+        self.state['difficulty'] = self.difficulty
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.send({'action': 'set_player_info', 'name': self.name, 'difficulty': self.difficulty})
+
+    def run(self):
+        try:
+            server_listener(self.sock, self.state, self)
+        finally:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.finished.set()
+
+    def place_ships(self, state):
+        placements = random_placements(state['board_size'], state['ships_to_place'], self.rng)
+        if placements is None:
+            print(f"Bot {self.name}: cannot fit ships on a {state['board_size']}x{state['board_size']} board.")
+            self.send({'action': 'disconnect'})
+            return
+        state['placed_ships_on_temp_board'] = placements
+        self.targets = [(r, c) for r in range(state['board_size']) for c in range(state['board_size'])]
+        self.rng.shuffle(self.targets)
+        self.shot_pending = False
+        self.send({'action': 'place_ships', 'ships': placements})
+
+    def shoot(self):
+        while self.targets:
+            row, col = self.targets.pop()
+            if (row, col) not in self.state['my_hits_on_opponent'] and (row, col) not in self.state['my_misses_on_opponent']:
+                self.shot_pending = True
+                self.shots_fired += 1
+                self.send({'action': 'shoot', 'row': row, 'col': col})
+                return
+
+    def message_applied(self, state, status, response):
+        if status == 'start_placement':
+            self.place_ships(state)
+        elif status in ('shot_result', 'invalid_shot', 'error'):
+            self.shot_pending = False
+        elif status == 'game_over':
+            self.games_played += 1
+            if self.games_played < self.games:
+                self.send({'action': 'request_restart'})
+            else:
+                self.send({'action': 'disconnect'})
+        elif status == 'opponent_disconnected':
+            state['current_screen'] = 'disconnected'
+
+        if status in ('game_start', 'turn_update', 'shot_result') and state['current_screen'] == 'game_screen' \
+                and state['your_turn'] and not state['game_over'] and not self.shot_pending \
+                and not (response and response.get('game_over')):
+            self.shoot()
+
+
+def run_bots(players, games=1, difficulty='easy', host=HOST, port=PORT, timeout=None, seed=None, bot_class=BotPlayer):
+    """
+    Uruchamia `players` botów w jednym procesie (jeden wątek na bota) i czeka,
+    aż wszystkie skończą. Kolejne pary łączą się w pokoje w kolejności startu.
+    """
+    bots = []
+    for i in range(players):
+        bot = bot_class(f"bot{i}", difficulty, games, host, port, None if seed is None else seed + i)
+        bot.start()
+        bots.append(bot)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for bot in bots:
+        remaining = None if deadline is None else max(0, deadline - time.monotonic())
+        bot.finished.wait(remaining)
+    return bots
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Headless Battleship bots for load testing the server.")
+    parser.add_argument('--players', type=int, default=100)
+    parser.add_argument('--games', type=int, default=1)
+    parser.add_argument('--difficulty', choices=DIFFICULTIES, default='easy')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--timeout', type=float, default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    bots = run_bots(args.players, args.games, args.difficulty, args.host, args.port, args.timeout)
+    elapsed = time.perf_counter() - started
+    finished = sum(bot.finished.is_set() for bot in bots)
+    games = sum(bot.games_played for bot in bots) // 2
+    shots = sum(bot.shots_fired for bot in bots)
+    print(f"{finished}/{len(bots)} bots finished, {games} games, {shots} shots in {elapsed:.2f}s")
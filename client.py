@@ -1,13 +1,16 @@
 import pygame
 import socket
 import threading
-import pickle
 import sys
 import time
 import os
 import math 
+from collections import deque
 
-from generate_assets import get_assets 
+from client_state import ClientEvents, new_client_state, send_message
+from client_state import server_listener as run_server_listener
+from generate_assets import get_assets, get_font, load_atlas, render_text
+from placement import ship_cells
 
 
 pygame.init()
@@ -24,57 +27,50 @@ assets = get_assets()
 COLORS = assets['colors']
 create_button_surface = assets['button_template']
 create_board_surface = assets['board_template']
+atlas = load_atlas()
 
 
 
 HOST = '127.00.1' 
 PORT = 65432       
 BUFFER_SIZE = 4096
+BACKGROUND_MODE = os.environ.get('BATTLESHIP_BACKGROUND', 'animated')
+ACTIVE_FPS = 60
+IDLE_FPS = 10
+IDLE_AFTER_MS = 2000
+PROFILER_KEY = pygame.K_F3
+PROFILER_WINDOW = 120
 
 
-client_game_state = {
-    'player_name': '',
-    'difficulty': 'easy',
-    'board_size': 0,
-    'my_board': [],    
-    'opponent_board_view': [],
-    'ships_to_place': [], 
-    'placed_ships_on_temp_board': [], 
-    'current_placing_ship_index': 0,
-    'current_placing_ship_orientation': 'horizontal', 
-    'placement_temp_board': [],
-    'my_hits_on_opponent': set(), 
-    'my_misses_on_opponent': set(),
-    'opponent_hits_on_my_board': set(), 
-    'opponent_misses_on_my_board': set(), 
-    'current_screen': 'main_menu',
-    'message': '',
-    'your_turn': False,
-    'game_started': False,
-    'game_over': False,
-    'winner': None,
-    'scoreboard': [],
-    'restart_requested_by_opponent': False,
-    'server_connection': None,
-    'input_active': False,
-    'input_text': '', 
-    'opponent_name': '',
-    'your_name': ''
-}
+client_game_state = new_client_state()
 
 class Button:
-    def __init__(self, x, y, width, height, text, action, font_size=30, button_color=COLORS['sky_blue'], text_color=COLORS['night_black']):
+    DIFFICULTY_ACTIONS = {
+        "set_difficulty_easy": "easy",
+        "set_difficulty_medium": "medium",
+        "set_difficulty_hard": "hard"
+    }
+
+    def __init__(self, x, y, width, height, text, action, font_size=30, button_color=COLORS['sky_blue'], text_color=COLORS['night_black'],
+                 hover_color=COLORS['light_gray_accent'], selected_color=COLORS['sun_yellow']):
         self.rect = pygame.Rect(x, y, width, height)
         self.text = text
         self.action = action
         self.font_size = font_size
         self.original_button_color = button_color 
-        self.current_button_color = button_color
         self.text_color = text_color
-        self.surface = self._create_surface()
-
-    def _create_surface(self):
-        return create_button_surface(self.rect.width, self.rect.height, self.text, self.font_size, self.current_button_color, self.text_color)
+        self.surfaces = {
+            'normal': self._create_surface(button_color),
+            'hover': self._create_surface(hover_color),
+            'selected': self._create_surface(selected_color),
+        }
+        self.hovered = False
+        self.selected = False
+        self.state = 'normal'
+        self.surface = self.surfaces['normal']
+
+    def _create_surface(self, color):
+        return create_button_surface(self.rect.width, self.rect.height, self.text, self.font_size, color, self.text_color)
 
     def draw(self, screen):
         screen.blit(self.surface, self.rect)
@@ -84,39 +80,31 @@ class Button:
             if self.rect.collidepoint(event.pos):
                 return self.action
         return None
-    
-    def set_color(self, color):
-        self.current_button_color = color
-        self.surface = self._create_surface()
+
+    def _set_state(self):
+        state = 'selected' if self.selected else 'hover' if self.hovered else 'normal'
+        if state == self.state:
+            return False
+        self.state = state
+        self.surface = self.surfaces[state]
+        return True
+
+    def set_selected(self, selected):
+        self.selected = selected
+        return self._set_state()
 
     def update(self, mouse_pos):
-        if self.rect.collidepoint(mouse_pos):
-            if client_game_state['current_screen'] == 'main_menu' and \
-               self.action.startswith("set_difficulty") and \
-               self.current_button_color == COLORS['sun_yellow']:
-                pass 
-            else:
-                self.set_color(COLORS['light_gray_accent']) 
-        else:
-            if client_game_state['current_screen'] == 'main_menu' and \
-               self.action.startswith("set_difficulty"):
-                difficulty_value_map = {
-                    "set_difficulty_easy": "easy",
-                    "set_difficulty_medium": "medium",
-                    "set_difficulty_hard": "hard"
-                }
-                if difficulty_value_map.get(self.action) == client_game_state['difficulty']:
-                    self.set_color(COLORS['sun_yellow']) 
-                else:
-                    self.set_color(self.original_button_color) 
-            else:
-                self.set_color(self.original_button_color)
+        self.hovered = self.rect.collidepoint(mouse_pos)
+        difficulty = self.DIFFICULTY_ACTIONS.get(self.action)
+        if client_game_state['current_screen'] == 'main_menu' and difficulty:
+            self.selected = difficulty == client_game_state['difficulty']
+        return self._set_state()
 
 
 class TextInputBox:
     def __init__(self, x, y, width, height, font_size=30, border_color=COLORS['night_black'], active_color=COLORS['navy_blue'], inactive_color=COLORS['silver_gray']):
         self.rect = pygame.Rect(x, y, width, height)
-        self.font = pygame.font.Font(None, font_size)
+        self.font_size = font_size
         self.color = inactive_color
         self.active = False
         self.text = ''
@@ -151,268 +139,360 @@ class TextInputBox:
     def draw(self, screen): 
         pygame.draw.rect(screen, self.color, self.rect)
         pygame.draw.rect(screen, self.border_color, self.rect, 2)
-        text_surface = self.font.render(self.text, True, self.text_color)
+        text_surface = render_text(self.text, self.font_size, self.text_color)
         text_rect = text_surface.get_rect(center=self.rect.center)
         screen.blit(text_surface, text_rect)
 
     def update(self, mouse_pos):
         pass
 
-def send_to_server(sock, data):
-    try:
-        serialized_data = pickle.dumps(data)
-        sock.sendall(serialized_data)
-    except Exception as e:
-        print(f"Error sending data to server: {e}")
-        client_game_state['current_screen'] = 'disconnected'
-        if sock: sock.close()
-
-def receive_from_server(sock):
-    try:
-        data = sock.recv(BUFFER_SIZE)
-        if not data:
+class RedrawTracker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.full = True
+        self.rects = []
+        self.last_activity = 0
+
+    def invalidate(self, rect=None):
+        with self.lock:
+            if rect is None:
+                self.full = True
+                self.rects = []
+            elif not self.full:
+                self.rects.append(pygame.Rect(rect))
+
+    def touch(self):
+        self.last_activity = pygame.time.get_ticks()
+
+    def is_idle(self, now):
+        return now - self.last_activity > IDLE_AFTER_MS
+
+    def collect(self):
+        with self.lock:
+            full, rects = self.full, self.rects
+            self.full = False
+            self.rects = []
+        return full, rects
+
+
+redraw = RedrawTracker()
+
+class FrameProfiler:
+    STAGES = ('background', 'boards', 'text', 'buttons', 'other', 'overlay', 'flip')
+
+    def __init__(self, window=PROFILER_WINDOW):
+        self.enabled = False
+        self.current = dict.fromkeys(self.STAGES, 0.0)
+        self.history = {stage: deque(maxlen=window) for stage in self.STAGES}
+        self.frame_times = deque(maxlen=window)
+        self.frame_ends = deque(maxlen=window)
+        self.frame_started = 0.0
+        self.last_mark = 0.0
+        self.rect = pygame.Rect(10, 10, 230, 22 * (len(self.STAGES) + 2) + 10)
+
+    def begin_frame(self):
+        for stage in self.STAGES:
+            self.current[stage] = 0.0
+        self.frame_started = self.last_mark = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.current[stage] += now - self.last_mark
+        self.last_mark = now
+
+    def end_frame(self):
+        for stage in self.STAGES:
+            self.history[stage].append(self.current[stage])
+        self.frame_times.append(self.last_mark - self.frame_started)
+        self.frame_ends.append(self.last_mark)
+
+    def average_ms(self, stage=None):
+        values = self.frame_times if stage is None else self.history[stage]
+        return sum(values) * 1000 / len(values) if values else 0.0
+
+    def fps(self):
+        if len(self.frame_ends) < 2:
+            return 0.0
+        return (len(self.frame_ends) - 1) / (self.frame_ends[-1] - self.frame_ends[0])
+
+    def draw(self, target):
+        font = get_font(20)
+        panel = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        lines = [f"FPS {self.fps():6.1f}", f"frame {self.average_ms():6.2f} ms"]
+        lines += [f"{stage:<10} {self.average_ms(stage):6.2f} ms" for stage in self.STAGES]
+        for i, line in enumerate(lines):
+            panel.blit(font.render(line, True, COLORS['cloud_white']), (8, 6 + i * 22))
+        target.blit(panel, self.rect)
+
+
+profiler = FrameProfiler()
+STATUS_AREA = pygame.Rect(0, SCREEN_HEIGHT - 120, SCREEN_WIDTH, 120)
+STATUS_AREA_UPDATES = ('shot_result', 'opponent_shot', 'turn_update', 'invalid_shot', 'error', 'board_snapshot')
+
+class BoardRenderer:
+    def __init__(self, ship_border_color=None):
+        self.ship_border_color = ship_border_color
+        self.surface = None
+        self.board_size = None
+        self.cell_size = None
+        self.generation = None
+        self.screen_pos = None
+        self.dirty_cells = deque()
+
+    def mark_dirty(self, row, col):
+        self.dirty_cells.append((row, col))
+        if self.screen_pos is not None and self.cell_size:
+            redraw.invalidate((self.screen_pos[0] + col * self.cell_size, self.screen_pos[1] + row * self.cell_size,
+                               self.cell_size, self.cell_size))
+
+    def screen_rect(self):
+        if self.surface is None or self.screen_pos is None:
             return None
-        return pickle.loads(data)
-    except (EOFError, pickle.UnpicklingError) as e:
-        print(f"Error unpickling data or connection closed by server: {e}")
-        return None
-    except Exception as e:
-        print(f"Error receiving data from server: {e}")
-        return None
-
-def server_listener(sock):
-    while client_game_state['current_screen'] != 'disconnected':
-        response = receive_from_server(sock)
-        if response is None:
-            print("Server disconnected or sent empty data.")
-            client_game_state['current_screen'] = 'disconnected'
-            break
-
-        status = response.get('status')
-
-        if status == 'waiting_for_other_player':
-            client_game_state['message'] = "Oczekiwanie na drugiego gracza..."
-            client_game_state['current_screen'] = 'waiting_screen'
-
-        elif status == 'start_placement':
-            client_game_state['game_started'] = False 
-            client_game_state['game_over'] = False
-            client_game_state['your_turn'] = False 
-            client_game_state['message'] = "Rozmieść swoje statki!"
-            client_game_state['your_name'] = response.get('your_name')
-            client_game_state['opponent_name'] = response.get('opponent_name')
-            client_game_state['board_size'] = response.get('board_size')
-            client_game_state['ships_to_place'] = response.get('ships_to_place', [])
-            
-    
-            client_game_state['placed_ships_on_temp_board'] = []
-            client_game_state['current_placing_ship_index'] = 0
-            client_game_state['current_placing_ship_orientation'] = 'horizontal'
-            client_game_state['placement_temp_board'] = [['.' for _ in range(client_game_state['board_size'])] for _ in range(client_game_state['board_size'])]
-
-            client_game_state['my_board'] = [['.' for _ in range(client_game_state['board_size'])] for _ in range(client_game_state['board_size'])]
-            client_game_state['opponent_board_view'] = [['.' for _ in range(client_game_state['board_size'])] for _ in range(client_game_state['board_size'])]
-
-            client_game_state['my_hits_on_opponent'] = set()
-            client_game_state['my_misses_on_opponent'] = set()
-            client_game_state['opponent_hits_on_my_board'] = set()
-            client_game_state['opponent_misses_on_my_board'] = set()
-            
-            client_game_state['current_screen'] = 'placement_screen'
-
-        elif status == 'game_start':
-            client_game_state['game_started'] = True
-            client_game_state['game_over'] = False
-            client_game_state['your_turn'] = response.get('your_turn')
-            client_game_state['message'] = "Gra rozpoczęta!"
-            client_game_state['my_board'] = response.get('my_initial_board', [])
-
-            client_game_state['current_screen'] = 'game_screen'
-
-        elif status == 'turn_update':
-            client_game_state['your_turn'] = response.get('your_turn')
-            if client_game_state['your_turn']:
-                client_game_state['message'] = "Twoja tura!"
+        return self.surface.get_rect(topleft=self.screen_pos)
+
+    def _draw_cell(self, row, col, value):
+        cell_size = self.cell_size
+        rect = pygame.Rect(col * cell_size, row * cell_size, cell_size, cell_size)
+        self.surface.set_clip(rect)
+        self.surface.fill(COLORS['sky_blue'], rect)
+        border_color = COLORS['light_gray_accent']
+        if value == 'S':
+            self.surface.fill(COLORS['forest_green'], rect)
+            if self.ship_border_color:
+                border_color = self.ship_border_color
+        elif value in ('X', 'H'):
+            if 'hit_mark' in atlas:
+                self.surface.blit(atlas.get_scaled('hit_mark', cell_size), rect)
             else:
-                client_game_state['message'] = "Tura przeciwnika..."
-
-        elif status == 'shot_result':
-            result = response.get('result')
-            row, col = response.get('row'), response.get('col')
-            ship_sunk = response.get('ship_sunk')
-            client_game_state['your_turn'] = response.get('your_turn_continues') 
-            
-            if result == 'hit':
-                client_game_state['my_hits_on_opponent'].add((row, col))
-                client_game_state['opponent_board_view'][row][col] = 'H' 
-                client_game_state['message'] = f"Trafiłeś! ({row},{col})"
-                if ship_sunk:
-                    client_game_state['message'] += " Statek zatopiony!"
+                self.surface.fill(COLORS['crimson_red'], rect)
+                pygame.draw.line(self.surface, COLORS['night_black'], rect.topleft, rect.bottomright, 3)
+                pygame.draw.line(self.surface, COLORS['night_black'], rect.bottomleft, rect.topright, 3)
+        elif value in ('O', 'M'):
+            if 'miss_mark' in atlas:
+                self.surface.blit(atlas.get_scaled('miss_mark', cell_size), rect)
             else:
-                client_game_state['my_misses_on_opponent'].add((row, col))
-                client_game_state['opponent_board_view'][row][col] = 'M' 
-                client_game_state['message'] = f"Pudło! ({row},{col})"
-            
-            if client_game_state['your_turn']:
-                client_game_state['message'] += " Twoja tura kontynuuje."
+                pygame.draw.circle(self.surface, COLORS['night_black'], rect.center, cell_size // 4, 2)
+        pygame.draw.rect(self.surface, border_color, rect, 1)
+        self.surface.set_clip(None)
+
+    def draw(self, target, pos, board_size, cell_size, board_size_pixels, cell_at, generation):
+        if self.surface is None or board_size != self.board_size or cell_size != self.cell_size or generation != self.generation:
+            self.board_size = board_size
+            self.cell_size = cell_size
+            self.generation = generation
+            self.dirty_cells.clear()
+            self.surface = create_board_surface(board_size_pixels, cell_size, COLORS['sky_blue'], COLORS['light_gray_accent'])
+            for r in range(board_size):
+                for c in range(board_size):
+                    self._draw_cell(r, c, cell_at(r, c))
+        else:
+            while self.dirty_cells:
+                r, c = self.dirty_cells.popleft()
+                if 0 <= r < board_size and 0 <= c < board_size:
+                    self._draw_cell(r, c, cell_at(r, c))
+        self.screen_pos = pos
+        target.blit(self.surface, pos)
+
+
+board_renderers = {
+    'placement': BoardRenderer(ship_border_color=COLORS['night_black']),
+    'my_board': BoardRenderer(),
+    'opponent_board': BoardRenderer(),
+}
+
+def invalidate_boards():
+    client_game_state['board_generation'] += 1
+
+ANIMATION_POOL_SIZE = 64
+ANIMATION_SEQUENCES = {
+    'explosion': ([f'explosion_frame_{i:02d}' for i in range(1, 10)], 45),
+    'fire': (['fire_animation_1', 'fire_animation_2'] * 4, 90),
+    'splash': (['water_splash'], 350),
+}
+
+class AnimationPool:
+    def __init__(self, capacity=ANIMATION_POOL_SIZE):
+        self.sequences = {}
+        for name, (frames, frame_ms) in ANIMATION_SEQUENCES.items():
+            frames = tuple(frame for frame in frames if frame in atlas)
+            if frames:
+                self.sequences[name] = (frames, frame_ms, len(frames) * frame_ms)
+        self.scaled_frames = {}
+        self.slot_sequence = [None] * capacity
+        self.slot_start = [0] * capacity
+        self.slot_rects = [pygame.Rect(0, 0, 0, 0) for _ in range(capacity)]
+        self.free_slots = list(range(capacity - 1, -1, -1))
+        self.active_slots = []
+        self.pending = deque()
+
+    def spawn(self, sequence, board_key, row, col):
+        if sequence in self.sequences:
+            self.pending.append((sequence, board_key, row, col))
+
+    def busy(self):
+        return bool(self.active_slots or self.pending)
+
+    def _frames(self, sequence, cell_size):
+        key = (sequence, cell_size)
+        frames = self.scaled_frames.get(key)
+        if frames is None:
+            frames = tuple(atlas.get_scaled(name, cell_size) for name in self.sequences[sequence][0])
+            self.scaled_frames[key] = frames
+        return frames
+
+    def _start_pending(self, now):
+        while self.pending:
+            sequence, board_key, row, col = self.pending.popleft()
+            renderer = board_renderers[board_key]
+            if renderer.screen_pos is None or not renderer.cell_size:
+                continue
+            if self.free_slots:
+                slot = self.free_slots.pop()
+                self.active_slots.append(slot)
             else:
-                 client_game_state['message'] += " Tura przeciwnika."
-
-
-        elif status == 'opponent_shot':
-            result = response.get('result')
-            row, col = response.get('row'), response.get('col')
-            ship_sunk = response.get('ship_sunk')
-            if response.get('your_board_state'):
-                 client_game_state['my_board'] = response.get('your_board_state')
-            
-            if result == 'hit':
-                client_game_state['opponent_hits_on_my_board'].add((row, col))
-                client_game_state['message'] = f"Przeciwnik trafił Twój statek! ({row},{col})"
-                if ship_sunk:
-                    client_game_state['message'] += " Twój statek zatopiony!"
+                slot = min(self.active_slots, key=self.slot_start.__getitem__)
+                redraw.invalidate(self.slot_rects[slot])
+            cell_size = renderer.cell_size
+            self.slot_sequence[slot] = sequence
+            self.slot_start[slot] = now
+            self.slot_rects[slot].update(renderer.screen_pos[0] + col * cell_size,
+                                         renderer.screen_pos[1] + row * cell_size, cell_size, cell_size)
+            self._frames(sequence, cell_size)
+
+    def update(self, now):
+        self._start_pending(now)
+        active = self.active_slots
+        i = 0
+        while i < len(active):
+            slot = active[i]
+            redraw.invalidate(self.slot_rects[slot])
+            if now - self.slot_start[slot] >= self.sequences[self.slot_sequence[slot]][2]:
+                active[i] = active[-1]
+                active.pop()
+                self.free_slots.append(slot)
             else:
-                client_game_state['opponent_misses_on_my_board'].add((row, col))
-                client_game_state['message'] = f"Przeciwnik spudłował! ({row},{col})"
-
-        elif status == 'invalid_shot' or status == 'error':
-            client_game_state['message'] = response.get('message')
-
-        elif status == 'game_over':
-            client_game_state['game_over'] = True
-            client_game_state['winner'] = response.get('winner')
-            client_game_state['scoreboard'] = response.get('scoreboard')
-            client_game_state['current_screen'] = 'scoreboard'
-            client_game_state['message'] = f"Gra zakończona! Zwycięzca: {client_game_state['winner']}"
-
-        elif status == 'restart_request':
-            client_game_state['restart_requested_by_opponent'] = True
-            client_game_state['message'] = f"Gracz {response.get('from')} prosi o ponowną rozgrywkę. Akceptujesz?"
-            client_game_state['current_screen'] = 'scoreboard'
-
-        elif status == 'restart_declined':
-            client_game_state['restart_requested_by_opponent'] = False
-            client_game_state['message'] = f"Gracz {response.get('from')} odrzucił prośbę o restart."
-
-        elif status == 'game_restarted':
-            pass 
-
-        elif status == 'opponent_disconnected':
-            client_game_state['message'] = "Przeciwnik rozłączył się. Powrót do menu głównego."
-            client_game_state['current_screen'] = 'main_menu'
-            if client_game_state['server_connection']:
-                try:
-                    client_game_state['server_connection'].close()
-                except:
-                    pass
-                client_game_state['server_connection'] = None
-            reset_client_state_for_new_game()
-
-        elif status == 'restart_cancelled_opponent_left':
-            client_game_state['message'] = "Przeciwnik opuścił grę, prośba o restart anulowana."
-            client_game_state['restart_requested_by_opponent'] = False 
-            client_game_state['current_screen'] = 'scoreboard' 
-
-        elif status == 'server_full':
-            client_game_state['message'] = "Serwer jest pełny. Spróbuj ponownie później."
-            client_game_state['current_screen'] = 'main_menu'
-            if sock: 
-                try:
-                    sock.close()
-                except:
-                    pass
-            client_game_state['server_connection'] = None
-            reset_client_state_for_new_game() 
-
-
-def reset_client_state_for_new_game():
-    client_game_state['player_name'] = ''
-    client_game_state['difficulty'] = 'easy'
-    client_game_state['board_size'] = 0
-    client_game_state['my_board'] = []
-    client_game_state['opponent_board_view'] = []
-    client_game_state['ships_to_place'] = []
-    client_game_state['placed_ships_on_temp_board'] = []
-    client_game_state['current_placing_ship_index'] = 0
-    client_game_state['current_placing_ship_orientation'] = 'horizontal'
-    client_game_state['placement_temp_board'] = []
-    client_game_state['my_hits_on_opponent'] = set()
-    client_game_state['my_misses_on_opponent'] = set()
-    client_game_state['opponent_hits_on_my_board'] = set()
-    client_game_state['opponent_misses_on_my_board'] = set()
-    client_game_state['your_turn'] = False
-    client_game_state['game_started'] = False
-    client_game_state['game_over'] = False
-    client_game_state['winner'] = None
-    client_game_state['restart_requested_by_opponent'] = False
-    client_game_state['input_active'] = False
-    client_game_state['input_text'] = ''
-    client_game_state['opponent_name'] = ''
-    client_game_state['your_name'] = ''
-    client_game_state['message'] = ''
+                i += 1
+
+    def draw(self, target, now):
+        for slot in self.active_slots:
+            sequence = self.slot_sequence[slot]
+            rect = self.slot_rects[slot]
+            index = (now - self.slot_start[slot]) // self.sequences[sequence][1]
+            frames = self.scaled_frames[(sequence, rect.width)]
+            if index < len(frames):
+                target.blit(frames[index], rect)
+
+
+animations = AnimationPool()
+
+def spawn_shot_animation(board_key, row, col, result, ship_sunk):
+    if result == 'hit':
+        animations.spawn('explosion', board_key, row, col)
+        if ship_sunk:
+            animations.spawn('fire', board_key, row, col)
+    else:
+        animations.spawn('splash', board_key, row, col)
+
+class ScreenEvents(ClientEvents):
+    def boards_replaced(self, state):
+        invalidate_boards()
 
+    def cell_changed(self, state, board_key, row, col):
+        board_renderers[board_key].mark_dirty(row, col)
 
+    def shot_landed(self, state, board_key, row, col, result, ship_sunk):
+        spawn_shot_animation(board_key, row, col, result, ship_sunk)
+
+    def message_applied(self, state, status, response):
+        if status in STATUS_AREA_UPDATES and state['current_screen'] == 'game_screen':
+            redraw.invalidate(STATUS_AREA)
+        else:
+            redraw.invalidate()
+        redraw.touch()
+
+
+screen_events = ScreenEvents()
+
+def send_to_server(sock, data):
+    send_message(sock, data, client_game_state)
+
+def server_listener(sock):
+    run_server_listener(sock, client_game_state, screen_events, BUFFER_SIZE)
+
+class AnimatedBackground:
+    def __init__(self, width, height, base_color, amplitude=10, wave=0.02, speed=0.002, mode=BACKGROUND_MODE):
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.period = 2 * math.pi / wave
+        self.scroll_speed = speed / wave
+        strip_height = height + int(math.ceil(self.period)) + 1
+        self.strip = pygame.Surface((width, strip_height)).convert()
+        for y in range(strip_height):
+            offset = int(amplitude * math.sin(y * wave))
+            color = tuple(max(0, min(255, channel + offset)) for channel in base_color)
+            pygame.draw.line(self.strip, color, (0, y), (width, y))
+        self.area = pygame.Rect(0, 0, width, height)
+
+    def draw(self, target, time_elapsed):
+        if self.mode == 'static':
+            self.area.y = 0
+        else:
+            self.area.y = int((time_elapsed * self.scroll_speed) % self.period)
+        target.blit(self.strip, (0, 0), self.area)
+
+
+background = AnimatedBackground(SCREEN_WIDTH, SCREEN_HEIGHT, COLORS['deep_ocean'])
 
 def draw_background(screen, time_elapsed):
-    for y in range(SCREEN_HEIGHT):
-        r = COLORS['deep_ocean'][0] + int(10 * math.sin(y * 0.02 + time_elapsed * 0.002))
-        g = COLORS['deep_ocean'][1] + int(10 * math.sin(y * 0.02 + time_elapsed * 0.002))
-        b = COLORS['deep_ocean'][2] + int(10 * math.sin(y * 0.02 + time_elapsed * 0.002))
-        
-        r = max(0, min(255, r))
-        g = max(0, min(255, g))
-        b = max(0, min(255, b))
-        
-        pygame.draw.line(screen, (r, g, b), (0, y), (SCREEN_WIDTH, y))
+    background.draw(screen, time_elapsed)
+    profiler.mark('background')
 
 def draw_main_menu(name_input_box, difficulty_buttons, play_button, time_elapsed):
     draw_background(screen, time_elapsed)
     
-    font_large = pygame.font.Font(None, 74)
-    font_medium = pygame.font.Font(None, 48)
-    
-    title_text = font_large.render("BATTLESHIPS", True, COLORS['cloud_white'])
+    title_text = render_text("BATTLESHIPS", 74, COLORS['cloud_white'])
     screen.blit(title_text, title_text.get_rect(center=(SCREEN_WIDTH // 2, 100)))
 
-    name_label = font_medium.render("Enter Your Player Name:", True, COLORS['cloud_white'])
+    name_label = render_text("Enter Your Player Name:", 48, COLORS['cloud_white'])
     screen.blit(name_label, name_label.get_rect(center=(SCREEN_WIDTH // 2, 200)))
     name_input_box.draw(screen)
 
-    difficulty_label = font_medium.render("Choose Difficulty:", True, COLORS['cloud_white'])
+    difficulty_label = render_text("Choose Difficulty:", 48, COLORS['cloud_white'])
     screen.blit(difficulty_label, difficulty_label.get_rect(center=(SCREEN_WIDTH // 2, 350)))
+    profiler.mark('text')
 
     for button in difficulty_buttons:
         button.draw(screen)
     
     play_button.draw(screen)
+    profiler.mark('buttons')
 
     if client_game_state['message']:
-        message_text = pygame.font.Font(None, 30).render(client_game_state['message'], True, COLORS['crimson_red'])
+        message_text = render_text(client_game_state['message'], 30, COLORS['crimson_red'])
         screen.blit(message_text, message_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 50)))
+    profiler.mark('text')
 
 def draw_waiting_screen(time_elapsed):
     draw_background(screen, time_elapsed)
-    font_large = pygame.font.Font(None, 74)
-    font_medium = pygame.font.Font(None, 48)
 
-    waiting_text = font_large.render("Waiting for opponent...", True, COLORS['cloud_white'])
+    waiting_text = render_text("Waiting for opponent...", 74, COLORS['cloud_white'])
     screen.blit(waiting_text, waiting_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50)))
 
-    message_text = font_medium.render(client_game_state['message'], True, COLORS['sun_yellow'])
+    message_text = render_text(client_game_state['message'], 48, COLORS['sun_yellow'])
     screen.blit(message_text, message_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 50)))
+    profiler.mark('text')
 
 def draw_placement_screen(mouse_pos, time_elapsed, place_button):
     draw_background(screen, time_elapsed)
 
-    font_large = pygame.font.Font(None, 60)
-    font_medium = pygame.font.Font(None, 36)
-    font_small = pygame.font.Font(None, 24)
-
-    title_text = font_large.render("Place Your Ships", True, COLORS['cloud_white'])
+    title_text = render_text("Place Your Ships", 60, COLORS['cloud_white'])
     screen.blit(title_text, title_text.get_rect(center=(SCREEN_WIDTH // 2, 50)))
 
-    message_text = font_medium.render(client_game_state['message'], True, COLORS['sun_yellow'])
+    message_text = render_text(client_game_state['message'], 36, COLORS['sun_yellow'])
     screen.blit(message_text, message_text.get_rect(center=(SCREEN_WIDTH // 2, 100)))
+    profiler.mark('text')
 
     board_padding = 50
     board_size_pixels = min(SCREEN_WIDTH - 2 * board_padding, SCREEN_HEIGHT - 200) 
@@ -427,15 +507,13 @@ def draw_placement_screen(mouse_pos, time_elapsed, place_button):
     board_x = (SCREEN_WIDTH - board_size_pixels) // 2
     board_y = 150 
 
-    board_surface = create_board_surface(board_size_pixels, cell_size, COLORS['sky_blue'], COLORS['light_gray_accent'])
-    screen.blit(board_surface, (board_x, board_y))
-
-    for ship in client_game_state['placed_ships_on_temp_board']:
-        ship_color = COLORS['forest_green']
-        for r, c in ship['coords']:
-            rect = pygame.Rect(board_x + c * cell_size, board_y + r * cell_size, cell_size, cell_size)
-            pygame.draw.rect(screen, ship_color, rect)
-            pygame.draw.rect(screen, COLORS['night_black'], rect, 1) 
+    validator = client_game_state['placement_validator']
+    occupied = validator.occupied if validator else 0
+    board_size = client_game_state['board_size']
+    board_renderers['placement'].draw(
+        screen, (board_x, board_y), board_size, cell_size, board_size_pixels,
+        lambda r, c: 'S' if occupied >> (r * board_size + c) & 1 else '.',
+        client_game_state['board_generation'])
 
     if client_game_state['current_placing_ship_index'] < len(client_game_state['ships_to_place']):
         current_ship_size = client_game_state['ships_to_place'][client_game_state['current_placing_ship_index']]
@@ -444,41 +522,16 @@ def draw_placement_screen(mouse_pos, time_elapsed, place_button):
         mouse_grid_x = (mouse_pos[0] - board_x) // cell_size
         mouse_grid_y = (mouse_pos[1] - board_y) // cell_size
 
-        temp_ship_coords = []
-        is_valid_placement = True
-        temp_board = [['.' for _ in range(client_game_state['board_size'])] for _ in range(client_game_state['board_size'])]
-
-        for ship in client_game_state['placed_ships_on_temp_board']:
-            for r, c in ship['coords']:
-                if 0 <= r < client_game_state['board_size'] and 0 <= c < client_game_state['board_size']:
-                    temp_board[r][c] = 'S'
-
-        for i in range(current_ship_size):
-            r, c = (mouse_grid_y + i, mouse_grid_x) if orientation == 'vertical' else (mouse_grid_y, mouse_grid_x + i)
-            
-            if not (0 <= r < client_game_state['board_size'] and 0 <= c < client_game_state['board_size']):
-                is_valid_placement = False
-                break
-
-            for dr in [-1, 0, 1]:
-                for dc in [-1, 0, 1]:
-                    nr, nc = r + dr, c + dc
-                    if 0 <= nr < client_game_state['board_size'] and 0 <= nc < client_game_state['board_size'] and temp_board[nr][nc] == 'S':
-                        is_valid_placement = False
-                        break
-                if not is_valid_placement:
-                    break
-            
-            if not is_valid_placement:
-                break
-            
-            temp_ship_coords.append((r, c))
+        temp_ship_coords = [(r, c) for r, c in ship_cells(mouse_grid_y, mouse_grid_x, current_ship_size, orientation)
+                            if 0 <= r < board_size and 0 <= c < board_size]
+        is_valid_placement = validator.can_place(validator.ship_mask(mouse_grid_y, mouse_grid_x, current_ship_size, orientation))
 
         hover_color = COLORS['sun_yellow'] if is_valid_placement else COLORS['crimson_red']
         for r, c in temp_ship_coords:
             rect = pygame.Rect(board_x + c * cell_size, board_y + r * cell_size, cell_size, cell_size)
             pygame.draw.rect(screen, hover_color, rect)
             pygame.draw.rect(screen, COLORS['night_black'], rect, 2) 
+    profiler.mark('boards')
 
 
     ships_to_place_text = "Ships to place: "
@@ -487,27 +540,27 @@ def draw_placement_screen(mouse_pos, time_elapsed, place_button):
         if i == client_game_state['current_placing_ship_index']:
             color = COLORS['sun_yellow'] 
         ships_to_place_text += f"{ship_size} "
-        font_ship_size = font_small.render(str(ship_size), True, color)
+        font_ship_size = render_text(str(ship_size), 24, color)
         screen.blit(font_ship_size, (board_x + board_size_pixels + 20 + i * 30, board_y + 50))
 
-    rotate_text = font_small.render("Press R to rotate ship", True, COLORS['silver_gray'])
+    rotate_text = render_text("Press R to rotate ship", 24, COLORS['silver_gray'])
     screen.blit(rotate_text, rotate_text.get_rect(midbottom=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 80)))
+    profiler.mark('text')
 
     if client_game_state['current_placing_ship_index'] == len(client_game_state['ships_to_place']):
         place_button.draw(screen)
+    profiler.mark('buttons')
 
 
 def draw_game_screen(mouse_pos, time_elapsed):
     draw_background(screen, time_elapsed)
 
-    font_small = pygame.font.Font(None, 24)
-    font_medium = pygame.font.Font(None, 36)
-
-    player1_label = font_medium.render(f"Your Board ({client_game_state['your_name']})", True, COLORS['cloud_white'])
+    player1_label = render_text(f"Your Board ({client_game_state['your_name']})", 36, COLORS['cloud_white'])
     screen.blit(player1_label, (50, 20))
 
-    player2_label = font_medium.render(f"Opponent's Board ({client_game_state['opponent_name']})", True, COLORS['cloud_white'])
+    player2_label = render_text(f"Opponent's Board ({client_game_state['opponent_name']})", 36, COLORS['cloud_white'])
     screen.blit(player2_label, (SCREEN_WIDTH // 2 + 50, 20))
+    profiler.mark('text')
 
     board_padding = 50
     max_board_area_width = (SCREEN_WIDTH // 2) - board_padding * 2
@@ -526,87 +579,65 @@ def draw_game_screen(mouse_pos, time_elapsed):
     player_board_y = 70
     
 
-    player_board_surface = create_board_surface(board_size_pixels, cell_size, COLORS['sky_blue'], COLORS['light_gray_accent'])
-    screen.blit(player_board_surface, (player_board_x, player_board_y))
-
-    if client_game_state['my_board'] and client_game_state['board_size'] > 0:
-        for r in range(client_game_state['board_size']):
-            for c in range(client_game_state['board_size']):
-                rect = pygame.Rect(player_board_x + c * cell_size, player_board_y + r * cell_size, cell_size, cell_size)
-                
-               
-                if client_game_state['my_board'][r][c] == 'S':
-                    pygame.draw.rect(screen, COLORS['forest_green'], rect) 
-                elif client_game_state['my_board'][r][c] == 'X':
-                    pygame.draw.rect(screen, COLORS['crimson_red'], rect) 
-                    pygame.draw.line(screen, COLORS['night_black'], rect.topleft, rect.bottomright, 3)
-                    pygame.draw.line(screen, COLORS['night_black'], rect.bottomleft, rect.topright, 3)
-                elif client_game_state['my_board'][r][c] == 'O':
-                    pygame.draw.circle(screen, COLORS['night_black'], rect.center, cell_size // 4, 2) 
-                
-                pygame.draw.rect(screen, COLORS['light_gray_accent'], rect, 1) 
+    my_board = client_game_state['my_board']
+    board_renderers['my_board'].draw(
+        screen, (player_board_x, player_board_y), len(my_board), cell_size, board_size_pixels,
+        lambda r, c: my_board[r][c], client_game_state['board_generation'])
 
     
     opponent_board_x = SCREEN_WIDTH // 2 + board_padding
     opponent_board_y = 70
 
-   
-    opponent_board_surface = create_board_surface(board_size_pixels, cell_size, COLORS['sky_blue'], COLORS['light_gray_accent'])
-    screen.blit(opponent_board_surface, (opponent_board_x, opponent_board_y))
+    opponent_board_view = client_game_state['opponent_board_view']
+    board_renderers['opponent_board'].draw(
+        screen, (opponent_board_x, opponent_board_y), len(opponent_board_view), cell_size, board_size_pixels,
+        lambda r, c: opponent_board_view[r][c], client_game_state['board_generation'])
 
-    
-    if client_game_state['opponent_board_view'] and client_game_state['board_size'] > 0:
-        for r in range(client_game_state['board_size']):
-            for c in range(client_game_state['board_size']):
-                rect = pygame.Rect(opponent_board_x + c * cell_size, opponent_board_y + r * cell_size, cell_size, cell_size)
-                
-                if client_game_state['opponent_board_view'][r][c] == 'H':
-                    pygame.draw.rect(screen, COLORS['crimson_red'], rect) 
-                    pygame.draw.line(screen, COLORS['night_black'], rect.topleft, rect.bottomright, 3)
-                    pygame.draw.line(screen, COLORS['night_black'], rect.bottomleft, rect.topright, 3)
-                elif client_game_state['opponent_board_view'][r][c] == 'M':
-                    pygame.draw.circle(screen, COLORS['night_black'], rect.center, cell_size // 4, 2) 
-                
-            
-                if client_game_state['your_turn'] and rect.collidepoint(mouse_pos) and \
-                   client_game_state['opponent_board_view'][r][c] == '.': 
-                    pygame.draw.rect(screen, COLORS['sun_yellow'], rect, 3) 
-                
-                pygame.draw.rect(screen, COLORS['light_gray_accent'], rect, 1)
+    animations.draw(screen, pygame.time.get_ticks())
+
+    if client_game_state['your_turn'] and opponent_board_view and cell_size > 0:
+        col = (mouse_pos[0] - opponent_board_x) // cell_size
+        row = (mouse_pos[1] - opponent_board_y) // cell_size
+        if 0 <= row < len(opponent_board_view) and 0 <= col < len(opponent_board_view) and \
+           opponent_board_view[row][col] == '.':
+            rect = pygame.Rect(opponent_board_x + col * cell_size, opponent_board_y + row * cell_size, cell_size, cell_size)
+            pygame.draw.rect(screen, COLORS['sun_yellow'], rect, 3)
+    profiler.mark('boards')
 
 
-    message_text = font_medium.render(client_game_state['message'], True, COLORS['sun_yellow'])
+    message_text = render_text(client_game_state['message'], 36, COLORS['sun_yellow'])
     screen.blit(message_text, message_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 50)))
 
     turn_indicator_color = COLORS['forest_green'] if client_game_state['your_turn'] else COLORS['crimson_red']
-    turn_text = font_medium.render("YOUR TURN" if client_game_state['your_turn'] else "OPPONENT'S TURN", True, turn_indicator_color)
+    turn_text = render_text("YOUR TURN" if client_game_state['your_turn'] else "OPPONENT'S TURN", 36, turn_indicator_color)
     screen.blit(turn_text, turn_text.get_rect(midtop=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 100)))
+    profiler.mark('text')
 
 def draw_scoreboard_screen(restart_button, exit_button, accept_restart_button, decline_restart_button, time_elapsed):
     draw_background(screen, time_elapsed)
-    
-    font_large = pygame.font.Font(None, 74)
-    font_medium = pygame.font.Font(None, 48)
-    font_small = pygame.font.Font(None, 36)
 
-    title_text = font_large.render("Game Results", True, COLORS['cloud_white'])
+    title_text = render_text("Game Results", 74, COLORS['cloud_white'])
     screen.blit(title_text, title_text.get_rect(center=(SCREEN_WIDTH // 2, 80)))
 
-    winner_text = font_medium.render(f"Winner: {client_game_state['winner']}", True, COLORS['forest_green'])
+    winner_text = render_text(f"Winner: {client_game_state['winner']}", 48, COLORS['forest_green'])
     screen.blit(winner_text, winner_text.get_rect(center=(SCREEN_WIDTH // 2, 150)))
 
-    scoreboard_label = font_medium.render("Top Players:", True, COLORS['cloud_white'])
+    scoreboard_label = render_text("Top Players:", 48, COLORS['cloud_white'])
     screen.blit(scoreboard_label, scoreboard_label.get_rect(center=(SCREEN_WIDTH // 2, 220)))
 
     y_offset = 270
     if client_game_state['scoreboard']:
         for i, entry in enumerate(client_game_state['scoreboard']):
-            score_text = font_small.render(f"{i+1}. {entry['name']}: {entry['wins']} wins", True, COLORS['silver_gray'])
+            rank = i + 1
+            if entry['name'] == client_game_state['winner'] and client_game_state['winner_rank']:
+                rank = client_game_state['winner_rank']
+            score_text = render_text(f"{rank}. {entry['name']}: {entry['wins']} wins", 36, COLORS['silver_gray'])
             screen.blit(score_text, score_text.get_rect(center=(SCREEN_WIDTH // 2, y_offset)))
             y_offset += 40
     else:
-        no_score_text = font_small.render("No scores to display yet.", True, COLORS['silver_gray'])
+        no_score_text = render_text("No scores to display yet.", 36, COLORS['silver_gray'])
         screen.blit(no_score_text, no_score_text.get_rect(center=(SCREEN_WIDTH // 2, y_offset)))
+    profiler.mark('text')
 
     button_y_pos = SCREEN_HEIGHT - 100 
     message_y_pos = SCREEN_HEIGHT - 180 
@@ -617,66 +648,27 @@ def draw_scoreboard_screen(restart_button, exit_button, accept_restart_button, d
         restart_button.draw(screen)
         exit_button.draw(screen)
         if client_game_state['message']:
-            message_text = pygame.font.Font(None, 30).render(client_game_state['message'], True, COLORS['crimson_red'])
+            message_text = render_text(client_game_state['message'], 30, COLORS['crimson_red'])
             screen.blit(message_text, message_text.get_rect(center=(SCREEN_WIDTH // 2, message_y_pos)))
     else:
-        message_text = font_medium.render(client_game_state['message'], True, COLORS['sun_yellow'])
+        message_text = render_text(client_game_state['message'], 48, COLORS['sun_yellow'])
         screen.blit(message_text, message_text.get_rect(center=(SCREEN_WIDTH // 2, message_y_pos)))
         
         accept_restart_button.rect.centery = button_y_pos
         decline_restart_button.rect.centery = button_y_pos
         accept_restart_button.draw(screen)
         decline_restart_button.draw(screen)
+    profiler.mark('buttons')
 
 
 def draw_disconnected_screen(time_elapsed):
     draw_background(screen, time_elapsed)
-    font_large = pygame.font.Font(None, 74)
-    message_text = font_large.render("Disconnected from server!", True, COLORS['crimson_red'])
+    message_text = render_text("Disconnected from server!", 74, COLORS['crimson_red'])
     screen.blit(message_text, message_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)))
 
-    instruction_text = pygame.font.Font(None, 36).render("Check the server and restart the client.", True, COLORS['cloud_white'])
+    instruction_text = render_text("Check the server and restart the client.", 36, COLORS['cloud_white'])
     screen.blit(instruction_text, instruction_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 80)))
-
-def get_ship_coords(start_row, start_col, ship_size, orientation, board_size):
-    coords = []
-    is_valid = True
-    for i in range(ship_size):
-        r, c = (start_row + i, start_col) if orientation == 'vertical' else (start_row, start_col + i)
-        if not (0 <= r < board_size and 0 <= c < board_size):
-            is_valid = False
-            break
-        coords.append((r, c))
-    return coords, is_valid
-
-def check_collision_and_buffer(coords, placed_ships, board_size):
-    temp_board_check = [['.' for _ in range(board_size)] for _ in range(board_size)]
-
-    for ship in placed_ships:
-        for r, c in ship['coords']:
-            temp_board_check[r][c] = 'S' 
-            for dr in [-1, 0, 1]:
-                for dc in [-1, 0, 1]:
-                    nr, nc = r + dr, c + dc
-                    if 0 <= nr < board_size and 0 <= nc < board_size and temp_board_check[nr][nc] == '.':
-                        temp_board_check[nr][nc] = 'B' 
-
-    for r, c in coords:
-        if not (0 <= r < board_size and 0 <= c < board_size):
-            return False 
-        if temp_board_check[r][c] in ['S', 'B']: 
-            return False
-        
-
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                nr, nc = r + dr, c + dc
-
-                if (nr, nc) in sum([s['coords'] for s in placed_ships], []):
-                    return False
-
-    return True
-
+    profiler.mark('text')
 
 def main():
     running = True
@@ -701,8 +693,7 @@ def main():
             button_color=COLORS['sky_blue'], text_color=COLORS['night_black']
         )
         difficulty_buttons.append(btn)
-        if config["difficulty_value"] == client_game_state['difficulty']:
-            btn.set_color(COLORS['sun_yellow']) 
+        btn.set_selected(config["difficulty_value"] == client_game_state['difficulty'])
 
     play_button = Button(SCREEN_WIDTH // 2 - 100, 500, 200, 60, "PLAY!", "start_game_request")
 
@@ -716,12 +707,37 @@ def main():
     conn = None
     listener_thread = None
 
+    hover_rects = {
+        'main_menu': [button.rect for button in difficulty_buttons] + [play_button.rect],
+        'scoreboard': [restart_button.rect, exit_button.rect, accept_restart_button.rect, decline_restart_button.rect],
+        'placement_screen': [place_ships_button.rect],
+    }
+    hover_boards = {
+        'placement_screen': board_renderers['placement'],
+        'game_screen': board_renderers['opponent_board'],
+    }
+    drawn_screen = None
+
     while running:
-        dt = clock.tick(60) 
-        time_elapsed += dt
+        idle = redraw.is_idle(pygame.time.get_ticks()) and not animations.busy()
+        dt = clock.tick(IDLE_FPS if idle else ACTIVE_FPS)
+        if not idle and background.mode != 'static':
+            time_elapsed += dt
+            redraw.invalidate()
 
         mouse_pos = pygame.mouse.get_pos()
         for event in pygame.event.get():
+            redraw.touch()
+            if event.type == pygame.MOUSEMOTION:
+                current_screen = client_game_state['current_screen']
+                for rect in hover_rects.get(current_screen, []):
+                    redraw.invalidate(rect)
+                hover_board = hover_boards.get(current_screen)
+                if hover_board is not None and hover_board.screen_rect() is not None:
+                    redraw.invalidate(hover_board.screen_rect())
+            else:
+                redraw.invalidate()
+
             if event.type == pygame.QUIT:
                 running = False
                 if conn:
@@ -731,6 +747,9 @@ def main():
                         print(f"Error sending exit message: {e}")
                 break
 
+            if event.type == pygame.KEYDOWN and event.key == PROFILER_KEY:
+                profiler.enabled = not profiler.enabled
+
             if client_game_state['current_screen'] == 'main_menu':
                 name_input_box.handle_event(event) 
                 
@@ -746,10 +765,7 @@ def main():
                         if selected_difficulty_value:
                             client_game_state['difficulty'] = selected_difficulty_value
                             for other_button in difficulty_buttons:
-                                if other_button.action == action_result:
-                                    other_button.set_color(COLORS['sun_yellow'])
-                                else:
-                                    other_button.set_color(COLORS['sky_blue'])
+                                other_button.set_selected(other_button.action == action_result)
 
                 action = play_button.handle_event(event)
                 if action == "start_game_request":
@@ -800,10 +816,14 @@ def main():
                         ship_size = client_game_state['ships_to_place'][current_ship_index]
                         orientation = client_game_state['current_placing_ship_orientation']
 
-                        proposed_coords, in_bounds = get_ship_coords(mouse_grid_y, mouse_grid_x, ship_size, orientation, client_game_state['board_size'])
+                        validator = client_game_state['placement_validator']
+                        ship_mask = validator.ship_mask(mouse_grid_y, mouse_grid_x, ship_size, orientation)
 
-                        if in_bounds and check_collision_and_buffer(proposed_coords, client_game_state['placed_ships_on_temp_board'], client_game_state['board_size']):
-                         
+                        if validator.can_place(ship_mask):
+                            validator.place(ship_mask)
+                            proposed_coords = ship_cells(mouse_grid_y, mouse_grid_x, ship_size, orientation)
+                            for r, c in proposed_coords:
+                                board_renderers['placement'].mark_dirty(r, c)
                             client_game_state['placed_ships_on_temp_board'].append({
                                 'coords': proposed_coords,
                                 'size': ship_size,
@@ -915,6 +935,17 @@ def main():
             if client_game_state['current_placing_ship_index'] == len(client_game_state['ships_to_place']):
                 place_ships_button.update(mouse_pos)
 
+        animations.update(pygame.time.get_ticks())
+        if profiler.enabled:
+            redraw.invalidate(profiler.rect)
+
+        full_redraw, dirty_rects = redraw.collect()
+        if client_game_state['current_screen'] != drawn_screen:
+            full_redraw = True
+        if not full_redraw and not dirty_rects:
+            continue
+        drawn_screen = client_game_state['current_screen']
+        profiler.begin_frame()
 
         if client_game_state['current_screen'] == 'main_menu':
             draw_main_menu(name_input_box, difficulty_buttons, play_button, time_elapsed)
@@ -928,8 +959,20 @@ def main():
             draw_scoreboard_screen(restart_button, exit_button, accept_restart_button, decline_restart_button, time_elapsed)
         elif client_game_state['current_screen'] == 'disconnected':
             draw_disconnected_screen(time_elapsed)
+        profiler.mark('other')
 
-        pygame.display.flip()
+        if profiler.enabled:
+            profiler.draw(screen)
+            if not full_redraw:
+                dirty_rects.append(profiler.rect)
+        profiler.mark('overlay')
+
+        if full_redraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty_rects)
+        profiler.mark('flip')
+        profiler.end_frame()
 
     if conn and client_game_state['server_connection']: 
         try:
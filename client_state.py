@@ -0,0 +1,290 @@
+from placement import PlacementValidator
+from protocol import FrameError, FrameReader, encode_frame
+
+BUFFER_SIZE = 4096
+
+
+def new_client_state():
+    return {
+        'player_name': '',
+        'difficulty': 'easy',
+        'board_size': 0,
+        'my_board': [],
+        'my_board_seq': 0,
+        'board_generation': 0,
+        'opponent_board_view': [],
+        'ships_to_place': [],
+        'placed_ships_on_temp_board': [],
+        'current_placing_ship_index': 0,
+        'current_placing_ship_orientation': 'horizontal',
+        'placement_validator': None,
+        'my_hits_on_opponent': set(),
+        'my_misses_on_opponent': set(),
+        'opponent_hits_on_my_board': set(),
+        'opponent_misses_on_my_board': set(),
+        'current_screen': 'main_menu',
+        'message': '',
+        'your_turn': False,
+        'game_started': False,
+        'game_over': False,
+        'winner': None,
+        'winner_rank': 0,
+        'scoreboard': [],
+        'restart_requested_by_opponent': False,
+        'server_connection': None,
+        'input_active': False,
+        'input_text': '',
+        'opponent_name': '',
+        'your_name': ''
+    }
+
+
+def reset_client_state(state):
+    state['player_name'] = ''
+    state['difficulty'] = 'easy'
+    state['board_size'] = 0
+    state['my_board'] = []
+    state['my_board_seq'] = 0
+    state['opponent_board_view'] = []
+    state['ships_to_place'] = []
+    state['placed_ships_on_temp_board'] = []
+    state['current_placing_ship_index'] = 0
+    state['current_placing_ship_orientation'] = 'horizontal'
+    state['placement_validator'] = None
+    state['my_hits_on_opponent'] = set()
+    state['my_misses_on_opponent'] = set()
+    state['opponent_hits_on_my_board'] = set()
+    state['opponent_misses_on_my_board'] = set()
+    state['your_turn'] = False
+    state['game_started'] = False
+    state['game_over'] = False
+    state['winner'] = None
+    state['winner_rank'] = 0
+    state['restart_requested_by_opponent'] = False
+    state['input_active'] = False
+    state['input_text'] = ''
+    state['opponent_name'] = ''
+    state['your_name'] = ''
+    state['message'] = ''
+
+
+class ClientEvents:
+    """
+    Punkty zaczepienia dla warstwy prezentacji. Maszyna stanów klienta woła je po
+    zmianach stanu; klient graficzny odświeża ekran, bot podejmuje kolejny ruch.
+    """
+    def boards_replaced(self, state):
+        pass
+
+    def cell_changed(self, state, board_key, row, col):
+        pass
+
+    def shot_landed(self, state, board_key, row, col, result, ship_sunk):
+        pass
+
+    def message_applied(self, state, status, response):
+        pass
+
+
+NO_EVENTS = ClientEvents()
+
+
+def send_message(sock, data, state):
+    try:
+        sock.sendall(encode_frame(data))
+    except Exception as e:
+        print(f"Error sending data to server: {e}")
+        state['current_screen'] = 'disconnected'
+        if sock: sock.close()
+
+
+def receive_message(reader):
+    try:
+        return reader.read_message()
+    except (EOFError, FrameError) as e:
+        print(f"Error decoding data or connection closed by server: {e}")
+        return None
+    except Exception as e:
+        print(f"Error receiving data from server: {e}")
+        return None
+
+
+def apply_server_message(state, response, sock, events=NO_EVENTS):
+    """
+    Aplikuje jedną wiadomość serwera do słownika stanu klienta. Nie używa pygame,
+    więc ten sam kod obsługuje okno gry i boty bez ekranu.
+    """
+    status = response.get('status')
+
+    if status == 'waiting_for_other_player':
+        state['message'] = "Oczekiwanie na drugiego gracza..."
+        state['current_screen'] = 'waiting_screen'
+
+    elif status == 'queue_position':
+        state['message'] = (f"Szukanie przeciwnika ({response.get('difficulty')}): "
+                            f"pozycja {response.get('position')} z {response.get('queue_size')}")
+        state['current_screen'] = 'waiting_screen'
+
+    elif status == 'start_placement':
+        state['game_started'] = False
+        state['game_over'] = False
+        state['your_turn'] = False
+        state['message'] = "Rozmieść swoje statki!"
+        state['your_name'] = response.get('your_name')
+        state['opponent_name'] = response.get('opponent_name')
+        state['board_size'] = response.get('board_size')
+        state['ships_to_place'] = response.get('ships_to_place', [])
+
+        state['placed_ships_on_temp_board'] = []
+        state['current_placing_ship_index'] = 0
+        state['current_placing_ship_orientation'] = 'horizontal'
+        state['placement_validator'] = PlacementValidator(state['board_size'])
+
+        state['my_board'] = [['.' for _ in range(state['board_size'])] for _ in range(state['board_size'])]
+        state['opponent_board_view'] = [['.' for _ in range(state['board_size'])] for _ in range(state['board_size'])]
+
+        state['my_hits_on_opponent'] = set()
+        state['my_misses_on_opponent'] = set()
+        state['opponent_hits_on_my_board'] = set()
+        state['opponent_misses_on_my_board'] = set()
+        events.boards_replaced(state)
+
+        state['current_screen'] = 'placement_screen'
+
+    elif status == 'game_start':
+        state['game_started'] = True
+        state['game_over'] = False
+        state['your_turn'] = response.get('your_turn')
+        state['message'] = "Gra rozpoczęta!"
+        state['my_board'] = response.get('my_initial_board', [])
+        state['my_board_seq'] = 0
+        events.boards_replaced(state)
+
+        state['current_screen'] = 'game_screen'
+
+    elif status == 'turn_update':
+        state['your_turn'] = response.get('your_turn')
+        if state['your_turn']:
+            state['message'] = "Twoja tura!"
+        else:
+            state['message'] = "Tura przeciwnika..."
+
+    elif status == 'shot_result':
+        result = response.get('result')
+        row, col = response.get('row'), response.get('col')
+        ship_sunk = response.get('ship_sunk')
+        state['your_turn'] = response.get('your_turn_continues')
+
+        if result == 'hit':
+            state['my_hits_on_opponent'].add((row, col))
+            state['opponent_board_view'][row][col] = 'H'
+            state['message'] = f"Trafiłeś! ({row},{col})"
+            if ship_sunk:
+                state['message'] += " Statek zatopiony!"
+        else:
+            state['my_misses_on_opponent'].add((row, col))
+            state['opponent_board_view'][row][col] = 'M'
+            state['message'] = f"Pudło! ({row},{col})"
+        events.cell_changed(state, 'opponent_board', row, col)
+        events.shot_landed(state, 'opponent_board', row, col, result, ship_sunk)
+
+        if state['your_turn']:
+            state['message'] += " Twoja tura kontynuuje."
+        else:
+            state['message'] += " Tura przeciwnika."
+
+    elif status == 'opponent_shot':
+        result = response.get('result')
+        row, col = response.get('row'), response.get('col')
+        ship_sunk = response.get('ship_sunk')
+        seq = response.get('seq')
+        if state['my_board'] and seq == state['my_board_seq'] + 1:
+            state['my_board'][row][col] = 'X' if result == 'hit' else 'O'
+            state['my_board_seq'] = seq
+            events.cell_changed(state, 'my_board', row, col)
+        elif seq > state['my_board_seq']:
+            send_message(sock, {'action': 'request_board_snapshot'}, state)
+        events.shot_landed(state, 'my_board', row, col, result, ship_sunk)
+
+        if result == 'hit':
+            state['opponent_hits_on_my_board'].add((row, col))
+            state['message'] = f"Przeciwnik trafił Twój statek! ({row},{col})"
+            if ship_sunk:
+                state['message'] += " Twój statek zatopiony!"
+        else:
+            state['opponent_misses_on_my_board'].add((row, col))
+            state['message'] = f"Przeciwnik spudłował! ({row},{col})"
+
+    elif status == 'board_snapshot':
+        if response.get('seq') >= state['my_board_seq']:
+            state['my_board'] = response.get('board')
+            state['my_board_seq'] = response.get('seq')
+            events.boards_replaced(state)
+
+    elif status == 'invalid_shot' or status == 'error':
+        state['message'] = response.get('message')
+
+    elif status == 'game_over':
+        state['game_over'] = True
+        state['winner'] = response.get('winner')
+        state['winner_rank'] = response.get('winner_rank')
+        state['scoreboard'] = response.get('scoreboard')
+        state['current_screen'] = 'scoreboard'
+        state['message'] = f"Gra zakończona! Zwycięzca: {state['winner']}"
+
+    elif status == 'restart_request':
+        state['restart_requested_by_opponent'] = True
+        state['message'] = f"Gracz {response.get('from')} prosi o ponowną rozgrywkę. Akceptujesz?"
+        state['current_screen'] = 'scoreboard'
+
+    elif status == 'restart_declined':
+        state['restart_requested_by_opponent'] = False
+        state['message'] = f"Gracz {response.get('from')} odrzucił prośbę o restart."
+
+    elif status == 'game_restarted':
+        pass
+
+    elif status == 'opponent_disconnected':
+        state['message'] = "Przeciwnik rozłączył się. Powrót do menu głównego."
+        state['current_screen'] = 'main_menu'
+        if state['server_connection']:
+            try:
+                state['server_connection'].close()
+            except:
+                pass
+            state['server_connection'] = None
+        reset_client_state(state)
+
+    elif status == 'restart_cancelled_opponent_left':
+        state['message'] = "Przeciwnik opuścił grę, prośba o restart anulowana."
+        state['restart_requested_by_opponent'] = False
+        state['current_screen'] = 'scoreboard'
+
+    elif status == 'server_full':
+        state['message'] = "Serwer jest pełny. Spróbuj ponownie później."
+        state['current_screen'] = 'main_menu'
+        if sock:
+            try:
+                sock.close()
+            except:
+                pass
+        state['server_connection'] = None
+        reset_client_state(state)
+
+    events.message_applied(state, status, response)
+
+
+def server_listener(sock, state, events=NO_EVENTS, buffer_size=BUFFER_SIZE):
+    reader = FrameReader(sock, buffer_size)
+    while state['current_screen'] != 'disconnected':
+        response = receive_message(reader)
+        if response is None:
+            print("Server disconnected or sent empty data.")
+            state['current_screen'] = 'disconnected'
+            events.message_applied(state, None, None)
+            break
+        if response.get('status') == 'batch':
+            for message in response['messages']:
+                apply_server_message(state, message, sock, events)
+        else:
+            apply_server_message(state, response, sock, events)
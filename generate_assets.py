@@ -1,5 +1,7 @@
 import pygame
 import os
+import json
+from collections import OrderedDict
 
 # Nowa, bardziej estetyczna paleta kolorów
 DEEP_OCEAN = (10, 40, 70)       # Ciemny, głęboki błękit - tło
@@ -13,6 +15,15 @@ SILVER_GRAY = (192, 192, 192)   # Szary - siatka, nieaktywne elementy
 NAVY_BLUE = (0, 0, 128)         # Ciemny granat - aktywny input box
 LIGHT_GRAY_ACCENT = (160, 160, 160) # Lżejszy szary dla akcentów
 
+TEXT_CACHE_MAX_BYTES = 8 * 1024 * 1024 # Limit pamięci na wyrenderowane napisy
+
+ASSETS_DIR = 'assets'
+ATLAS_IMAGE = 'atlas.png'               # Wszystkie sprite'y w jednej teksturze
+ATLAS_MANIFEST = 'atlas.json'           # Nazwa sprite'a -> [x, y, szerokość, wysokość] w atlasie
+ATLAS_WIDTH = 512
+ATLAS_PADDING = 1
+ATLAS_MAX_SPRITE_SIZE = 128             # Większe obrazy (np. 1024x1024) są zmniejszane przy pakowaniu
+
 def load_image(name, colorkey=None):
     """
     Ładuje obraz z katalogu 'assets'.
@@ -35,12 +46,63 @@ def load_image(name, colorkey=None):
         print("Using a placeholder surface instead.")
         return pygame.Surface((50, 50)) # Zwróć pustą powierzchnię jako placeholder
 
+_fonts = {}
+
+def get_font(font_size):
+    """
+    Zwraca współdzieloną czcionkę domyślną w danym rozmiarze (ładowaną tylko raz).
+    """
+    font = _fonts.get(font_size)
+    if font is None:
+        font = pygame.font.Font(None, font_size)
+        _fonts[font_size] = font
+    return font
+
+class TextCache:
+    """
+    Pamięć podręczna LRU wyrenderowanych napisów, kluczowana (tekst, rozmiar, kolor).
+    Najdawniej używane wpisy są usuwane, gdy suma bajtów powierzchni przekroczy max_bytes.
+    """
+    def __init__(self, max_bytes=TEXT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.entries = OrderedDict()
+
+    def render(self, text, font_size, color):
+        key = (text, font_size, tuple(color))
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            return surface
+        surface = get_font(font_size).render(text, True, color)
+        self.entries[key] = surface
+        self.used_bytes += self._surface_bytes(surface)
+        while self.used_bytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.used_bytes -= self._surface_bytes(evicted)
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+        self.used_bytes = 0
+
+    @staticmethod
+    def _surface_bytes(surface):
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+text_cache = TextCache()
+
+def render_text(text, font_size, color):
+    """
+    Renderuje napis przez wspólną pamięć podręczną - zwróconej powierzchni nie modyfikuj.
+    """
+    return text_cache.render(text, font_size, color)
+
 def create_simple_button_surface(width, height, text, font_size=30, button_color=SKY_BLUE, text_color=NIGHT_BLACK):
     """
     Tworzy prostą powierzchnię dla przycisku.
     """
-    font = pygame.font.Font(None, font_size)
-    text_surface = font.render(text, True, text_color)
+    text_surface = render_text(text, font_size, text_color)
     
     button_surface = pygame.Surface((width, height))
     button_surface.fill(button_color)
@@ -63,6 +125,82 @@ def create_board_surface(size_pixels, cell_size_pixels, board_color=SKY_BLUE, li
     
     return board_surface
 
+def build_atlas(source_dir=ASSETS_DIR, atlas_width=ATLAS_WIDTH, max_sprite_size=ATLAS_MAX_SPRITE_SIZE, save=True):
+    """
+    Krok budowania: pakuje wszystkie PNG z katalogu assets w jeden atlas (układanie na półkach)
+    i zapisuje atlas.png oraz atlas.json. Zwraca (powierzchnia_atlasu, regiony).
+    """
+    sprites = []
+    for filename in sorted(os.listdir(source_dir)):
+        if not filename.endswith('.png') or filename == ATLAS_IMAGE:
+            continue
+        image = pygame.image.load(os.path.join(source_dir, filename))
+        width, height = image.get_size()
+        if max(width, height) > max_sprite_size:
+            scale = max_sprite_size / max(width, height)
+            image = pygame.transform.smoothscale(image, (max(1, int(width * scale)), max(1, int(height * scale))))
+        sprites.append((os.path.splitext(filename)[0], image))
+
+    sprites.sort(key=lambda item: item[1].get_height(), reverse=True)
+    regions = {}
+    x = y = shelf_height = 0
+    for name, image in sprites:
+        width, height = image.get_size()
+        if x + width > atlas_width:
+            x = 0
+            y += shelf_height + ATLAS_PADDING
+            shelf_height = 0
+        regions[name] = [x, y, width, height]
+        x += width + ATLAS_PADDING
+        shelf_height = max(shelf_height, height)
+
+    atlas = pygame.Surface((atlas_width, max(1, y + shelf_height)), pygame.SRCALPHA)
+    for name, image in sprites:
+        atlas.blit(image, regions[name][:2])
+
+    if save:
+        pygame.image.save(atlas, os.path.join(source_dir, ATLAS_IMAGE))
+        with open(os.path.join(source_dir, ATLAS_MANIFEST), 'w') as f:
+            json.dump(regions, f, indent=2, sort_keys=True)
+    return atlas, regions
+
+class SpriteAtlas:
+    """
+    Atlas wczytany raz przy starcie. Sprite'y to podpowierzchnie atlasu,
+    a wersje przeskalowane do rozmiaru komórki są zapamiętywane.
+    """
+    def __init__(self, sheet, regions):
+        self.sheet = sheet
+        self.sprites = {name: sheet.subsurface(pygame.Rect(region)) for name, region in regions.items()}
+        self.scaled = {}
+
+    def __contains__(self, name):
+        return name in self.sprites
+
+    def get(self, name):
+        return self.sprites[name]
+
+    def get_scaled(self, name, size):
+        key = (name, size)
+        surface = self.scaled.get(key)
+        if surface is None:
+            surface = pygame.transform.smoothscale(self.sprites[name], (size, size))
+            self.scaled[key] = surface
+        return surface
+
+def load_atlas(source_dir=ASSETS_DIR):
+    """
+    Ładuje atlas jednym convert_alpha(). Jeśli atlasu nie zbudowano, pakuje go w pamięci.
+    """
+    try:
+        sheet = pygame.image.load(os.path.join(source_dir, ATLAS_IMAGE))
+        with open(os.path.join(source_dir, ATLAS_MANIFEST)) as f:
+            regions = json.load(f)
+    except (FileNotFoundError, pygame.error, ValueError) as e:
+        print(f"Atlas not available ({e}), packing sprites in memory.")
+        sheet, regions = build_atlas(source_dir, save=False)
+    return SpriteAtlas(sheet.convert_alpha(), regions)
+
 def get_assets():
     """
     Zwraca słownik z zasobami graficznymi.
@@ -88,4 +226,8 @@ def get_assets():
 
 # Upewnij się, że katalog 'assets' istnieje
 if not os.path.exists('assets'):
-    os.makedirs('assets')
\ No newline at end of file
+    os.makedirs('assets')
+
+if __name__ == '__main__':
+    atlas, regions = build_atlas()
+    print(f"Packed {len(regions)} sprites into {os.path.join(ASSETS_DIR, ATLAS_IMAGE)} ({atlas.get_width()}x{atlas.get_height()})")
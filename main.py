@@ -1,14 +1,42 @@
+import argparse
+import asyncio
+import contextlib
+import multiprocessing
+import selectors
+import signal
 import socket
+import struct
 import threading
 import pickle
+import json
+import os
 import time
 import random
+from collections import OrderedDict, deque
+
+from board import Bitboard
+from metrics import METRICS_DUMP_INTERVAL, ServerMetrics, start_file_dump, start_http_endpoint
+from placement import PlacementValidator, ship_cells
+from protocol import FrameDecoder, FrameError, FrameReader, encode_batch, encode_frame
 
 HOST = '127.0.0.1'
 DEFAULT_PORT = 65432
 PORT_RANGE_START = 65432
 PORT_RANGE_END = 65535
 BUFFER_SIZE = 4096
+SERVER_BACKLOG = 128
+MAX_ROOMS = 5000
+PLAYERS_PER_ROOM = 2
+SCOREBOARD_FLUSH_INTERVAL = 1.0
+SCOREBOARD_COMPACT_AFTER = 10000
+SCOREBOARD_TOP = 5
+QUEUE_UPDATE_INTERVAL = 1.0
+SERVER_MODES = ('threaded', 'asyncio')
+SERVER_MODE = 'threaded'
+SHARD_PACKET_SIZE = 65536
+OUTBOX_LIMIT = 256
+WRITE_BUFFER_LIMIT = 256 * 1024
+SLOW_CLIENT_TIMEOUT = 10
 
 GAME_CONFIG = {
     'easy': {'board_size': 8, 'ships': [5, 4, 3, 3, 2]},
@@ -16,52 +44,248 @@ GAME_CONFIG = {
     'hard': {'board_size': 12, 'ships': [5, 4, 4, 3, 3, 2, 2]}
 }
 
+class Scoreboard:
+    """
+    Ranking graczy trzymany w pamięci jako lista posortowana malejąco po liczbie wygranych,
+    z indeksem nazwa -> pozycja i granicami grup o równej liczbie wygranych. Wygrana przesuwa
+    gracza o jedną grupę w górę przez zamianę z pierwszym elementem jego grupy - O(1).
+    Zapis jest odroczony: wygrane trafiają partiami do dziennika (path + '.log') co
+    flush_interval sekund, a po compact_after wpisach dziennik jest zwijany do migawki w path.
+    """
+    def __init__(self, path='scoreboard.pkl', flush_interval=SCOREBOARD_FLUSH_INTERVAL,
+                 compact_after=SCOREBOARD_COMPACT_AFTER):
+        self.path = path
+        self.log_path = f"{path}.log"
+        self.flush_interval = flush_interval
+        self.compact_after = compact_after
+        self.entries = []
+        self.index = {}
+        self.group_start = {}
+        self.group_count = {}
+        self.pending = []
+        self.logged = 0
+        self.log_token = None
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.flusher = None
+        self.load()
+
+    def _reindex(self):
+        self.index = {}
+        self.group_start = {}
+        self.group_count = {}
+        for position, entry in enumerate(self.entries):
+            self.index[entry['name']] = position
+            wins = entry['wins']
+            if wins not in self.group_count:
+                self.group_start[wins] = position
+                self.group_count[wins] = 0
+            self.group_count[wins] += 1
+
+    def _read_snapshot(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            return [], None
+        if isinstance(data, dict):
+            return data['entries'], data.get('log_token')
+        return data, None
+
+    def _read_log(self, token):
+        names = []
+        try:
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                if f.readline().rstrip('\n') != str(token):
+                    return []
+                for line in f:
+                    try:
+                        names.append(json.loads(line))
+                    except ValueError:
+                        print(f"Skipping damaged scoreboard log line: {line!r}")
+        except FileNotFoundError:
+            pass
+        return names
+
+    def load(self):
+        try:
+            entries, token = self._read_snapshot()
+            names = self._read_log(token)
+        except Exception as e:
+            print(f"Error loading scoreboard: {e}")
+            entries, token, names = [], None, []
+        wins = {}
+        for entry in entries:
+            wins[entry['name']] = wins.get(entry['name'], 0) + entry['wins']
+        for name in names:
+            wins[name] = wins.get(name, 0) + 1
+        with self.lock:
+            self.entries = sorted(({'name': name, 'wins': count} for name, count in wins.items()),
+                                  key=lambda x: x['wins'], reverse=True)
+            self._reindex()
+            self.pending = []
+            self.logged = len(names)
+            self.log_token = token
+
+    def _increment(self, player_name):
+        position = self.index.get(player_name)
+        if position is None:
+            position = len(self.entries)
+            self.entries.append({'name': player_name, 'wins': 0})
+            self.index[player_name] = position
+            if 0 not in self.group_count:
+                self.group_start[0] = position
+                self.group_count[0] = 0
+            self.group_count[0] += 1
+        entry = self.entries[position]
+        wins = entry['wins']
+        first = self.group_start[wins]
+        if first != position:
+            other = self.entries[first]
+            self.entries[first], self.entries[position] = entry, other
+            self.index[player_name], self.index[other['name']] = first, position
+        entry['wins'] = wins + 1
+        self.group_count[wins] -= 1
+        if self.group_count[wins]:
+            self.group_start[wins] = first + 1
+        else:
+            del self.group_count[wins]
+            del self.group_start[wins]
+        if wins + 1 in self.group_count:
+            self.group_count[wins + 1] += 1
+        else:
+            self.group_start[wins + 1] = first
+            self.group_count[wins + 1] = 1
+
+    def add_win(self, player_name):
+        lock_requested = time.perf_counter()
+        with self.lock:
+            metrics.observe_lock_wait('scoreboard', time.perf_counter() - lock_requested)
+            self._increment(player_name)
+            self.pending.append(player_name)
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self.flusher.start()
+
+    def rank(self, player_name):
+        with self.lock:
+            position = self.index.get(player_name)
+        return None if position is None else position + 1
+
+    def snapshot(self):
+        with self.lock:
+            return [dict(entry) for entry in self.entries]
+
+    def top(self, count, player_name=None):
+        """
+        Pierwsze count wpisów rankingu i pozycja gracza player_name; jeśli jest poza nimi,
+        jego wpis jest dopisany na końcu. Kopiuje tylko te wpisy, nie cały ranking.
+        """
+        with self.lock:
+            entries = [dict(entry) for entry in self.entries[:count]]
+            position = self.index.get(player_name)
+            if position is not None and position >= count:
+                entries.append(dict(self.entries[position]))
+        return entries, None if position is None else position + 1
+
+    def _flush_loop(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+
+    def _write_atomic(self, path, mode, write):
+        temp_path = f"{path}.tmp"
+        with open(temp_path, mode) as f:
+            write(f)
+        os.replace(temp_path, path)
+
+    def flush(self, compact=False):
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, []
+                if not pending and not compact:
+                    return
+                self.logged += len(pending)
+                compact = compact or self.log_token is None or self.logged >= self.compact_after
+                entries = [dict(entry) for entry in self.entries] if compact else None
+            try:
+                if compact:
+                    token = f"{time.time_ns():x}"
+                    self._write_atomic(self.path, 'wb',
+                                       lambda f: pickle.dump({'entries': entries, 'log_token': token}, f))
+                    self._write_atomic(self.log_path, 'w', lambda f: f.write(f"{token}\n"))
+                    self.log_token = token
+                    self.logged = 0
+                else:
+                    with open(self.log_path, 'a', encoding='utf-8') as f:
+                        f.write(''.join(json.dumps(name) + '\n' for name in pending))
+            except Exception as e:
+                print(f"Error saving scoreboard: {e}")
+                self.log_token = None
+
+    def save(self):
+        self.flush(compact=True)
+
+    def close(self):
+        self.stopped.set()
+        if self.flusher is not None:
+            self.flush()
+
+
+class ScoreboardReplica(Scoreboard):
+    """
+    Kopia rankingu w procesie roboczym trybu wieloprocesowego. Nie zapisuje pliku:
+    własne wygrane liczy od razu i przekazuje koordynatorowi przez publish(name),
+    a wygrane z innych procesów dostaje od niego przez apply_win().
+    """
+    def __init__(self, path, publish):
+        self.publish = publish
+        super().__init__(path)
+
+    def add_win(self, player_name):
+        with self.lock:
+            self._increment(player_name)
+        self.publish(player_name)
+
+    def apply_win(self, player_name):
+        with self.lock:
+            self._increment(player_name)
+
+    def flush(self, compact=False):
+        pass
+
+
 class GameState:
-    def __init__(self):
+    def __init__(self, scoreboard=None):
         self.players = {}
         self.player_boards = {}
-        self.player_board_states = {}
-        self.player_ships = {}
+        self.player_board_seq = {}
         self.current_player_turn = None
         self.game_started = False
         self.game_over = False
         self.winner = None
         self.message_to_player = {}
-        self.scoreboard = []
         self.game_id_counter = 0
         self.player_ready_for_placement = {}
         self.player_placed_ships = {}
 
-        self.load_scoreboard()
+        self.scoreboard_store = scoreboard if scoreboard is not None else Scoreboard()
+
+    @property
+    def scoreboard(self):
+        return self.scoreboard_store.snapshot()
+
+    def top_scores(self, player_name=None):
+        return self.scoreboard_store.top(SCOREBOARD_TOP, player_name)
 
     def load_scoreboard(self):
-        try:
-            with open('scoreboard.pkl', 'rb') as f:
-                self.scoreboard = pickle.load(f)
-        except FileNotFoundError:
-            self.scoreboard = []
-        except Exception as e:
-            print(f"Error loading scoreboard: {e}")
-            self.scoreboard = []
+        self.scoreboard_store.load()
 
     def save_scoreboard(self):
-        try:
-            with open('scoreboard.pkl', 'wb') as f:
-                pickle.dump(self.scoreboard, f)
-        except Exception as e:
-            print(f"Error saving scoreboard: {e}")
+        self.scoreboard_store.save()
 
     def add_win_to_scoreboard(self, player_name):
-        found = False
-        for entry in self.scoreboard:
-            if entry['name'] == player_name:
-                entry['wins'] += 1
-                found = True
-                break
-        if not found:
-            self.scoreboard.append({'name': player_name, 'wins': 1})
-        self.scoreboard.sort(key=lambda x: x['wins'], reverse=True)
-        self.save_scoreboard()
+        self.scoreboard_store.add_win(player_name)
 
     def get_opponent_id(self, player_id):
         player_ids = list(self.players.keys())
@@ -72,8 +296,7 @@ class GameState:
     def reset_game(self):
         print("Resetting game state...")
         self.player_boards = {}
-        self.player_board_states = {}
-        self.player_ships = {}
+        self.player_board_seq = {}
         self.current_player_turn = None
         self.game_started = False
         self.game_over = False
@@ -85,7 +308,6 @@ class GameState:
 
         for player_id in self.players:
             self.players[player_id]['board_size'] = 0
-            self.players[player_id]['difficulty'] = 'easy'
             self.players[player_id]['my_initial_board'] = []
             self.players[player_id]['ready_to_play'] = False
             self.players[player_id]['restart_requested'] = False
@@ -113,51 +335,23 @@ class GameState:
 
     def place_ship(self, player_id, ship_coords):
         board_size = self.players[player_id]['board_size']
-        board = [['.' for _ in range(board_size)] for _ in range(board_size)]
-        ships_list = []
-
-        temp_board_for_validation = [['.' for _ in range(board_size)] for _ in range(board_size)]
+        board = Bitboard(board_size)
+        validator = PlacementValidator(board_size)
 
         for ship_data in ship_coords:
             ship_len = ship_data['size']
             orientation = ship_data['orientation']
             start_row, start_col = ship_data['start_pos']
-            
-            current_ship_cells = []
-            valid_placement = True
-
-            for i in range(ship_len):
-                r, c = (start_row + i, start_col) if orientation == 'vertical' else (start_row, start_col + i)
-                if not (0 <= r < board_size and 0 <= c < board_size):
-                    valid_placement = False
-                    break
-                
-                if temp_board_for_validation[r][c] == 'S':
-                    valid_placement = False
-                    break
-
-                for dr in [-1, 0, 1]:
-                    for dc in [-1, 0, 1]:
-                        nr, nc = r + dr, c + dc
-                        if 0 <= nr < board_size and 0 <= nc < board_size and temp_board_for_validation[nr][nc] == 'S':
-                            valid_placement = False
-                            break
-                    if not valid_placement:
-                        break
-                if not valid_placement:
-                    break
-                current_ship_cells.append((r, c))
 
-            if not valid_placement:
+            ship_mask = validator.ship_mask(start_row, start_col, ship_len, orientation)
+            if not validator.can_place(ship_mask):
                 return False
-            
-            for r, c in current_ship_cells:
-                temp_board_for_validation[r][c] = 'S'
-            ships_list.append({'coords': current_ship_cells, 'size': ship_len, 'hits': 0, 'sunk': False})
-
-        self.player_boards[player_id] = temp_board_for_validation
-        self.player_ships[player_id] = ships_list
-        self.player_board_states[player_id] = [['.' for _ in range(board_size)] for _ in range(board_size)]
+
+            validator.place(ship_mask)
+            board.add_ship(ship_cells(start_row, start_col, ship_len, orientation))
+
+        self.player_boards[player_id] = board
+        self.player_board_seq[player_id] = 0
         
         self.player_ready_for_placement[player_id] = True
         return True
@@ -175,40 +369,26 @@ class GameState:
             return {'status': 'error', 'message': 'No opponent found.'}
 
         opponent_board = self.player_boards[opponent_id]
-        opponent_board_view_for_player = self.player_board_states[opponent_id]
-        
-        board_size = self.players[player_id]['board_size']
 
-        if not (0 <= row < board_size and 0 <= col < board_size):
+        if not opponent_board.in_bounds(row, col):
             return {'status': 'invalid_shot', 'message': 'Shot out of bounds.'}
 
-        if opponent_board_view_for_player[row][col] in ['H', 'M']:
+        if opponent_board.is_shot(row, col):
             return {'status': 'invalid_shot', 'message': 'Already shot there.'}
 
         result = 'miss'
-        ship_sunk = False
         your_turn_continues = False
 
-        if opponent_board[row][col] == 'S':
+        hit, ship_sunk = opponent_board.shoot(row, col)
+        if hit:
             result = 'hit'
-            opponent_board[row][col] = 'X'
-            opponent_board_view_for_player[row][col] = 'H'
-            for ship in self.player_ships[opponent_id]:
-                if (row, col) in ship['coords']:
-                    ship['hits'] += 1
-                    if ship['hits'] == ship['size']:
-                        ship['sunk'] = True
-                        ship_sunk = True
-            if all(ship['sunk'] for ship in self.player_ships[opponent_id]):
+            if opponent_board.all_sunk():
                 self.game_over = True
                 self.winner = self.players[player_id]['name']
                 self.add_win_to_scoreboard(self.winner)
             else:
                 your_turn_continues = True
-        else:
-            opponent_board[row][col] = 'O'
-            opponent_board_view_for_player[row][col] = 'M'
-            your_turn_continues = False
+        self.player_board_seq[opponent_id] += 1
         return {
             'status': 'shot_result',
             'result': result,
@@ -218,216 +398,730 @@ class GameState:
             'your_turn_continues': your_turn_continues,
             'game_over': self.game_over,
             'winner': self.winner,
-            'your_board_state': self.player_boards[opponent_id]
+            'board_seq': self.player_board_seq[opponent_id]
         }
 
-game_state = GameState()
+class Room:
+    def __init__(self, room_id, scoreboard):
+        self.room_id = room_id
+        self.game_state = GameState(scoreboard)
+        self.lock = threading.Lock()
+        self.player_ids = []
+        self.closed = False
+
+    @contextlib.contextmanager
+    def locked(self, conn=None):
+        """
+        Blokada pokoju na czas jednej akcji. Odpowiedzi dopisane w środku przez queue_response()
+        wychodzą dopiero po jej zwolnieniu - do autora akcji (conn) i do graczy, którzy są
+        wtedy w pokoju - więc wolne gniazdo nie wydłuża czasu trzymania blokady.
+        """
+        lock_requested = time.perf_counter()
+        with self.lock:
+            acquired = time.perf_counter()
+            metrics.observe_lock_wait('room', acquired - lock_requested)
+            try:
+                yield
+            finally:
+                recipients = [player_info['conn'] for player_info in self.game_state.players.values()]
+                metrics.observe_lock_hold('room', time.perf_counter() - acquired)
+        if conn is not None:
+            conn.flush()
+        for recipient in recipients:
+            recipient.flush()
+
+
+class RoomManager:
+    def __init__(self, max_rooms=MAX_ROOMS, scoreboard=None, on_room_closed=None):
+        self.max_rooms = max_rooms
+        self.scoreboard = scoreboard if scoreboard is not None else Scoreboard()
+        self.on_room_closed = on_room_closed
+        self.rooms = {}
+        self.player_rooms = {}
+        self.room_counter = 0
+        self.lock = threading.Lock()
+
+    def has_capacity(self):
+        with self.lock:
+            return len(self.rooms) < self.max_rooms
+
+    def create_room(self, player_ids):
+        with self.lock:
+            if len(self.rooms) >= self.max_rooms:
+                return None
+            room = Room(f"room_{self.room_counter}", self.scoreboard)
+            self.room_counter += 1
+            self.rooms[room.room_id] = room
+            for player_id in player_ids:
+                room.player_ids.append(player_id)
+                self.player_rooms[player_id] = room
+            print(f"Created {room.room_id} ({len(self.rooms)} active rooms)")
+            return room
+
+    def leave(self, player_id):
+        with self.lock:
+            room = self.player_rooms.pop(player_id, None)
+            if room is None:
+                return
+            room.player_ids.remove(player_id)
+            room.closed = True
+            if not room.player_ids:
+                del self.rooms[room.room_id]
+                print(f"Closed {room.room_id} ({len(self.rooms)} active rooms)")
+                if self.on_room_closed is not None:
+                    self.on_room_closed()
+
+    def get_room(self, player_id):
+        with self.lock:
+            return self.player_rooms.get(player_id)
+
+    def stats(self):
+        with self.lock:
+            return {'rooms': len(self.rooms), 'players': len(self.player_rooms)}
+
+
+class Matchmaker:
+    """
+    Kolejki oczekujących graczy, osobna dla każdego poziomu trudności z GAME_CONFIG.
+    Dopisanie, wyjęcie pary i rezygnacja to operacje O(1) na OrderedDict. Pary łączy
+    osobny wątek, więc wątki połączeń nie czekają na tworzenie pokoi; ten sam wątek co
+    QUEUE_UPDATE_INTERVAL sekund wysyła czekającym zmienione pozycje w kolejce.
+    """
+    def __init__(self, room_manager, difficulties=tuple(GAME_CONFIG), update_interval=QUEUE_UPDATE_INTERVAL):
+        self.room_manager = room_manager
+        self.update_interval = update_interval
+        self.queues = {difficulty: OrderedDict() for difficulty in difficulties}
+        self.waiting = {}
+        self.reported_positions = {}
+        self.condition = threading.Condition()
+        self.pairs_ready = 0
+        self.thread = None
+
+    def _ensure_thread(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def enqueue(self, player_id, player_info, front=False):
+        difficulty = player_info['difficulty']
+        with self.condition:
+            previous = self.waiting.get(player_id)
+            if previous is not None and previous != difficulty:
+                self.queues[previous].pop(player_id, None)
+            queue = self.queues[difficulty]
+            player_info.setdefault('queued_at', time.perf_counter())
+            queue[player_id] = player_info
+            if front:
+                queue.move_to_end(player_id, last=False)
+            self.waiting[player_id] = difficulty
+            position = 1 if front else len(queue)
+            self.reported_positions[player_id] = position
+            queue_response(player_info['conn'], {'status': 'waiting_for_other_player', 'message': 'Oczekiwanie na drugiego gracza...'})
+            queue_response(player_info['conn'], {'status': 'queue_position', 'position': position,
+                                                 'queue_size': len(queue), 'difficulty': difficulty})
+            if len(queue) >= 2:
+                self.pairs_ready += 1
+                self.condition.notify()
+            self._ensure_thread()
+        player_info['conn'].flush()
+        return True
+
+    def is_queued(self, player_id):
+        with self.condition:
+            return player_id in self.waiting
+
+    def cancel(self, player_id):
+        with self.condition:
+            difficulty = self.waiting.pop(player_id, None)
+            if difficulty is not None:
+                self.queues[difficulty].pop(player_id, None)
+                self.reported_positions.pop(player_id, None)
+                return None
+            return self.room_manager.get_room(player_id)
+
+    def stats(self):
+        with self.condition:
+            return {f'queue_{difficulty}': len(queue) for difficulty, queue in self.queues.items()}
+
+    def _take_pairs(self):
+        pairs = []
+        for difficulty, queue in self.queues.items():
+            while len(queue) >= 2:
+                first = queue.popitem(last=False)
+                second = queue.popitem(last=False)
+                room = self.room_manager.create_room([first[0], second[0]])
+                if room is None:
+                    for player_id, player_info in (second, first):
+                        queue[player_id] = player_info
+                        queue.move_to_end(player_id, last=False)
+                    break
+                for player_id, _ in (first, second):
+                    self.waiting.pop(player_id, None)
+                    self.reported_positions.pop(player_id, None)
+                pairs.append((room, first, second))
+        self.pairs_ready = 0
+        return pairs
+
+    def _changed_positions(self):
+        updates = []
+        for difficulty, queue in self.queues.items():
+            size = len(queue)
+            for position, (player_id, player_info) in enumerate(queue.items(), 1):
+                if self.reported_positions.get(player_id) != position:
+                    self.reported_positions[player_id] = position
+                    updates.append((player_info['conn'], {'status': 'queue_position', 'position': position,
+                                                          'queue_size': size, 'difficulty': difficulty}))
+        return updates
+
+    def _start_match(self, room, first, second):
+        requeue = []
+        with room.locked():
+            if room.closed:
+                for player_id, player_info in (first, second):
+                    if player_id in room.player_ids:
+                        self.room_manager.leave(player_id)
+                        requeue.append((player_id, player_info))
+            else:
+                now = time.perf_counter()
+                for player_id, player_info in (first, second):
+                    metrics.observe_queue_wait(player_info['difficulty'], now - player_info.pop('queued_at', now))
+                begin_match(room, (first, second))
+        for player_id, player_info in requeue:
+            self.enqueue(player_id, player_info, front=True)
+
+    def _run(self):
+        last_update = time.monotonic()
+        while True:
+            try:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.pairs_ready, timeout=self.update_interval)
+                    pairs = self._take_pairs()
+                    updates = []
+                    if time.monotonic() - last_update >= self.update_interval:
+                        last_update = time.monotonic()
+                        updates = self._changed_positions()
+                for room, first, second in pairs:
+                    try:
+                        self._start_match(room, first, second)
+                    except Exception as e:
+                        print(f"Error starting match for {first[0]} and {second[0]}: {e}")
+                for conn, update in updates:
+                    send_response(conn, update)
+            except Exception as e:
+                print(f"Error in matchmaker: {e}")
+
+
+class ShardMatchmaker(Matchmaker):
+    """
+    Matchmaker koordynatora w trybie wieloprocesowym. Kolejki i parowanie są te same,
+    ale create_room() koordynatora zwraca numer procesu roboczego zamiast pokoju,
+    a rozpoczęcie meczu polega na przekazaniu gniazd obu graczy temu procesowi.
+    """
+    def _start_match(self, worker, first, second):
+        if not self.room_manager.send_match(worker, first, second):
+            for player_id, player_info in (second, first):
+                self.enqueue(player_id, player_info, front=True)
+            return
+        now = time.perf_counter()
+        for player_id, player_info in (first, second):
+            metrics.observe_queue_wait(player_info['difficulty'], now - player_info.pop('queued_at', now))
+        print(f"Matched {first[1]['name']} and {second[1]['name']} ({first[1]['difficulty']}) on worker {worker}")
+
+
+room_manager = RoomManager()
+matchmaker = Matchmaker(room_manager)
+metrics = ServerMetrics(lambda: dict(room_manager.stats(), **matchmaker.stats()))
+shard_link = None
+player_id_prefix = 'player'
 player_counter = 0
 lock = threading.Lock()
 
-def send_response(conn, response):
+def encode_response(response):
     try:
-        serialized_response = pickle.dumps(response)
-        conn.sendall(serialized_response)
+        encode_started = time.perf_counter()
+        frame = encode_frame(response)
+        metrics.observe_encode(len(frame), time.perf_counter() - encode_started)
+        return frame
     except Exception as e:
-        print(f"Error sending response: {e}")
+        print(f"Error encoding response: {e}")
+        return b''
+
+def queue_response(conn, response):
+    conn.put(response)
+
+def send_response(conn, response):
+    conn.put(response)
+    conn.flush()
 
-def handle_client(conn, addr, player_id):
+def next_player_id():
     global player_counter
+    with lock:
+        player_id = f"{player_id_prefix}_{player_counter}"
+        player_counter += 1
+    return player_id
+
+def handle_request(room, conn, addr, player_id, request):
+    action = request.get('action')
+
+    if room is None:
+        room = room_manager.get_room(player_id)
+    if room is None:
+        if action == 'disconnect':
+            return room, False
+        if matchmaker.is_queued(player_id):
+            send_response(conn, {'status': 'error', 'message': 'Czekasz w kolejce na przeciwnika.'})
+            return room, True
+        if action != 'set_player_info':
+            send_response(conn, {'status': 'error', 'message': 'Najpierw podaj nazwę gracza.'})
+            return room, True
+        if not room_manager.has_capacity():
+            print(f"Connection from {addr} rejected. Server is full.")
+            send_response(conn, {'status': 'server_full', 'message': 'Serwer jest pełny. Spróbuj ponownie później.'})
+            return room, False
+        difficulty = request.get('difficulty')
+        if difficulty not in GAME_CONFIG:
+            difficulty = 'easy'
+        keep_open = matchmaker.enqueue(player_id, new_player_info(conn, addr, request.get('name'), difficulty))
+        print(f"Player {request.get('name')} ({player_id}) queued for {difficulty}")
+        return room, keep_open
+    game_state = room.game_state
+
+    with room.locked(conn):
+        if player_id not in game_state.players:
+            queue_response(conn, {'status': 'error', 'message': 'Gra jeszcze się nie rozpoczęła.'})
+
+        elif action == 'set_player_info':
+            queue_response(conn, {'status': 'error', 'message': 'Jesteś już w grze.'})
+
+        elif action == 'place_ships':
+            ships_data = request.get('ships')
+            if game_state.place_ship(player_id, ships_data):
+                print(f"Player {player_id} successfully placed ships.")
+                if game_state.check_all_players_ready_for_placement():
+                    print("Both players ready for placement. Starting game!")
+                    player_ids = list(game_state.players.keys())
+                    game_state.current_player_turn = random.choice(player_ids)
+                    game_state.game_started = True
+
+                    for pid, player_info in game_state.players.items():
+                        opponent_id = game_state.get_opponent_id(pid)
+                        queue_response(player_info['conn'], {
+                            'status': 'game_start',
+                            'your_turn': (pid == game_state.current_player_turn),
+                            'my_initial_board': game_state.player_boards[pid].to_rows()
+                        })
+                else:
+                    queue_response(conn, {'status': 'waiting_for_other_player', 'message': 'Czekanie na przeciwnika...'})
+            else:
+                queue_response(conn, {'status': 'error', 'message': 'Nieprawidłowe rozmieszczenie statków. Spróbuj ponownie.'})
+
+        elif action == 'shoot':
+            row = request.get('row')
+            col = request.get('col')
+            if player_id == game_state.current_player_turn and not game_state.game_over:
+                shot_response = game_state.process_shot(player_id, row, col)
+                queue_response(conn, shot_response)
+                if shot_response['status'] != 'shot_result':
+                    return room, True
+
+                opponent_id = game_state.get_opponent_id(player_id)
+                if opponent_id:
+                    opponent_shot_info = {
+                        'status': 'opponent_shot',
+                        'row': row,
+                        'col': col,
+                        'result': shot_response['result'],
+                        'ship_sunk': shot_response['ship_sunk'],
+                        'seq': shot_response['board_seq']
+                    }
+                    queue_response(game_state.players[opponent_id]['conn'], opponent_shot_info)
+                    
+                    if not shot_response['your_turn_continues'] and not game_state.game_over:
+                        game_state.current_player_turn = opponent_id
+                        queue_response(conn, {'status': 'turn_update', 'your_turn': False})
+                        queue_response(game_state.players[opponent_id]['conn'], {'status': 'turn_update', 'your_turn': True})
+                    elif game_state.game_over:
+                        metrics.game_finished()
+                        scoreboard, winner_rank = game_state.top_scores(game_state.winner)
+                        for pid, player_info in game_state.players.items():
+                            queue_response(player_info['conn'], {
+                                'status': 'game_over',
+                                'winner': game_state.winner,
+                                'winner_rank': winner_rank,
+                                'scoreboard': scoreboard
+                            })
+            else:
+                queue_response(conn, {'status': 'error', 'message': 'To nie Twoja tura lub gra się zakończyła.'})
+
+        elif action == 'request_board_snapshot':
+            if player_id in game_state.player_boards:
+                queue_response(conn, {
+                    'status': 'board_snapshot',
+                    'seq': game_state.player_board_seq[player_id],
+                    'board': game_state.player_boards[player_id].to_rows()
+                })
+            else:
+                queue_response(conn, {'status': 'error', 'message': 'Brak planszy do wysłania.'})
+
+        elif action == 'request_restart':
+            game_state.players[player_id]['restart_requested'] = True
+            opponent_id = game_state.get_opponent_id(player_id)
+            if opponent_id:
+                if game_state.players[opponent_id]['restart_requested']:
+                    print("Both players requested restart. Resetting game.")
+                    game_state.reset_game()
+                    if game_state.prepare_new_game():
+                        send_start_placement(game_state)
+                    else:
+                        print("Error preparing new game after restart request.")
+                else:
+                    queue_response(game_state.players[opponent_id]['conn'], {
+                        'status': 'restart_request',
+                        'from': game_state.players[player_id]['name']
+                    })
+                    queue_response(conn, {'status': 'message', 'message': 'Oczekiwanie na odpowiedź przeciwnika...'})
+            else:
+                queue_response(conn, {'status': 'error', 'message': 'Nie ma przeciwnika do zrestartowania gry.'})
+        
+        elif action == 'accept_restart':
+            game_state.players[player_id]['restart_requested'] = True
+            opponent_id = game_state.get_opponent_id(player_id)
+            if opponent_id and game_state.players[opponent_id]['restart_requested']:
+                print("Both players accepted restart. Resetting game.")
+                game_state.reset_game()
+                if game_state.prepare_new_game():
+                    send_start_placement(game_state)
+                else:
+                    print("Error preparing new game after restart acceptance.")
+            else:
+                 queue_response(conn, {'status': 'message', 'message': 'Czekam na akceptację przeciwnika...'})
+
+        elif action == 'decline_restart':
+            opponent_id = game_state.get_opponent_id(player_id)
+            if opponent_id:
+                game_state.players[player_id]['restart_requested'] = False
+                queue_response(game_state.players[opponent_id]['conn'], {
+                    'status': 'restart_declined',
+                    'from': game_state.players[player_id]['name']
+                })
+                queue_response(conn, {'status': 'message', 'message': 'Odrzuciłeś prośbę o restart.'})
+            else:
+                queue_response(conn, {'status': 'error', 'message': 'Brak przeciwnika.'})
+
+        elif action == 'disconnect':
+            print(f"Player {player_id} disconnected gracefully.")
+            opponent_id = game_state.get_opponent_id(player_id)
+            if player_id in game_state.players:
+                del game_state.players[player_id]
+            if opponent_id and opponent_id in game_state.players:
+                queue_response(game_state.players[opponent_id]['conn'], {'status': 'opponent_disconnected'})
+                game_state.players[opponent_id]['restart_requested'] = False
+            return room, False
+    return room, True
+
+def decode_requests(decoder, data):
+    decode_started = time.perf_counter()
+    requests = decoder.feed(data)
+    metrics.observe_decode(len(data), len(requests), time.perf_counter() - decode_started)
+    return requests
+
+def dispatch_request(room, conn, addr, player_id, request):
+    handle_started = time.perf_counter()
+    result = handle_request(room, conn, addr, player_id, request)
+    metrics.observe_action(request.get('action'), time.perf_counter() - handle_started)
+    return result
+
+def new_player_info(conn, addr, name, difficulty):
+    return {
+        'conn': conn,
+        'addr': addr,
+        'name': name,
+        'difficulty': difficulty,
+        'ready_to_play': False,
+        'restart_requested': False
+    }
+
+def begin_match(room, players):
+    (first_id, first), (second_id, second) = players
+    game_state = room.game_state
+    game_state.players[first_id] = first
+    game_state.players[second_id] = second
+    print(f"Matched {first['name']} and {second['name']} ({first['difficulty']}) in {room.room_id}")
+    if game_state.prepare_new_game():
+        send_start_placement(game_state)
+    else:
+        print("Error preparing new game state.")
+
+def send_start_placement(game_state):
+    for pid, player_info in game_state.players.items():
+        opponent_id = game_state.get_opponent_id(pid)
+        queue_response(player_info['conn'], {
+            'status': 'start_placement',
+            'your_name': player_info['name'],
+            'opponent_name': game_state.players[opponent_id]['name'],
+            'board_size': player_info['board_size'],
+            'ships_to_place': player_info['ships_to_place']
+        })
+
+def release_player(room, addr, player_id):
+    if room is None:
+        room = matchmaker.cancel(player_id)
+    if room is None:
+        return
+    game_state = room.game_state
+    with room.locked():
+        if player_id in game_state.players:
+            print(f"Client {addr} ({player_id}) disconnected unexpectedly.")
+            opponent_id = game_state.get_opponent_id(player_id)
+            del game_state.players[player_id]
+            if opponent_id and opponent_id in game_state.players:
+                queue_response(game_state.players[opponent_id]['conn'], {'status': 'opponent_disconnected'})
+                game_state.players[opponent_id]['restart_requested'] = False
+    room_manager.leave(player_id)
+
+def unread_bytes(requests, decoder):
+    return b''.join(encode_frame(request) for request in requests) + bytes(decoder.buffer)
+
+def handle_client(conn, addr, player_id, room=None, unread=b''):
     print(f"Connected by {addr}, assigned ID: {player_id}")
+    reader = FrameReader(conn, BUFFER_SIZE)
+    keep_open = True
+    leftover = []
+    metrics.connection_opened()
     try:
+        while keep_open:
+            data = unread or reader.receive()
+            unread = b''
+            if data is None:
+                break
+            requests = decode_requests(reader.decoder, data)
+            for index, request in enumerate(requests):
+                room, keep_open = dispatch_request(room, conn, addr, player_id, request)
+                if not keep_open:
+                    leftover = requests[index + 1:]
+                    break
+                conn.drain()
+        if not keep_open and room is None and shard_link is not None:
+            conn.flush(wait=True)
+            shard_link.hand_off(player_id, conn, unread_bytes(leftover, reader.decoder))
+    except Exception as e:
+        print(f"Error handling client {addr}: {e}")
+    finally:
+        metrics.connection_closed()
+        release_player(room, addr, player_id)
+        try:
+            conn.close()
+        except OSError as e:
+            print(f"Error closing connection for {addr}: {e}")
+
+class QueuedConnection:
+    """
+    Połączenie z ograniczoną kolejką odpowiedzi. put() tylko dopisuje, więc wolno go wołać
+    pod blokadą; flush() budzi piszącego, który koduje wszystkie czekające wiadomości
+    i wysyła je jedną ramką 'batch' (np. shot_result + turn_update). Klient, który nie odbiera,
+    aż w kolejce uzbiera się ponad OUTBOX_LIMIT wiadomości, zostaje rozłączony.
+    """
+    def __init__(self, limit=OUTBOX_LIMIT):
+        self.outbox = deque()
+        self.limit = limit
+        self.dropped = False
+
+    def put(self, response):
+        if self.dropped:
+            return
+        self.outbox.append(response)
+        if len(self.outbox) > self.limit:
+            self.drop_slow_consumer(f"{len(self.outbox)} responses waiting")
+
+    def take_data(self):
+        frames = []
+        while self.outbox:
+            frame = encode_response(self.outbox.popleft())
+            if frame:
+                frames.append(frame)
+        if len(frames) < 2:
+            return b''.join(frames)
+        data = encode_batch(frames)
+        metrics.observe_batch(len(frames), len(data) - sum(map(len, frames)))
+        return data
+
+    def drop_slow_consumer(self, reason):
+        if self.dropped:
+            return
+        self.dropped = True
+        self.outbox.clear()
+        metrics.slow_consumer_dropped()
+        print(f"Disconnecting slow client: {reason}")
+        self.abort()
+
+class SocketConnection(QueuedConnection):
+    """
+    Połączenie trybu wątkowego. Kolejkę opróżnia osobny wątek piszący, uruchamiany przy
+    pierwszym flush(); gniazdo ma wyłączony algorytm Nagle'a (TCP_NODELAY), a zapis
+    blokujący dłużej niż SLOW_CLIENT_TIMEOUT (SO_SNDTIMEO) rozłącza klienta. drain()
+    wstrzymuje czytanie żądań, dopóki piszący nie odbierze odpowiedzi na nie (jak drain()
+    w asyncio). close() oddaje gniazdo piszącemu, jeśli ma jeszcze coś do wysłania.
+    """
+    def __init__(self, sock):
+        super().__init__()
+        self.sock = sock
+        self.wakeup = threading.Condition()
+        self.writer = None
+        self.writing = False
+        self.closed = False
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, struct.pack('ll', SLOW_CLIENT_TIMEOUT, 0))
+        except OSError as e:
+            print(f"Cannot set socket options: {e}")
+
+    def flush(self, wait=False):
+        with self.wakeup:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._write_loop, daemon=True)
+                self.writer.start()
+            self.wakeup.notify_all()
+            if wait:
+                self.wakeup.wait_for(lambda: not (self.outbox or self.writing) or self.dropped)
+
+    def drain(self):
+        if len(self.outbox) < self.limit // 2:
+            return
+        with self.wakeup:
+            self.wakeup.wait_for(lambda: len(self.outbox) < self.limit // 2 or self.dropped)
+
+    def _write_loop(self):
         while True:
-            data = conn.recv(BUFFER_SIZE)
+            with self.wakeup:
+                self.wakeup.wait_for(lambda: self.outbox or self.closed)
+                if not self.outbox:
+                    break
+                self.writing = True
+            data = self.take_data()
+            try:
+                if data and not self.dropped:
+                    self.sock.sendall(data)
+                    metrics.observe_write()
+            except BlockingIOError:
+                self.drop_slow_consumer(f"no progress for {SLOW_CLIENT_TIMEOUT}s")
+            except OSError as e:
+                print(f"Error sending response: {e}")
+                self.dropped = True
+                self.outbox.clear()
+            with self.wakeup:
+                self.writing = False
+                self.wakeup.notify_all()
+        self.sock.close()
+
+    def recv_into(self, buffer):
+        return self.sock.recv_into(buffer)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def abort(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self):
+        with self.wakeup:
+            self.closed = True
+            self.wakeup.notify_all()
+            if self.writer is not None and (self.outbox or self.writing):
+                return
+        self.sock.close()
+
+class AsyncConnection(QueuedConnection):
+    """
+    Połączenie trybu asyncio. Kolejkę opróżnia pętla zdarzeń (także gdy flush() woła inny
+    wątek); klient, któremu w buforze transportu zalega ponad WRITE_BUFFER_LIMIT bajtów,
+    zostaje rozłączony.
+    """
+    def __init__(self, writer):
+        super().__init__()
+        self.writer = writer
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        try:
+            writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            print(f"Cannot set socket options: {e}")
+
+    def flush(self, wait=False):
+        if threading.get_ident() == self.loop_thread:
+            self._write()
+        else:
+            self.loop.call_soon_threadsafe(self._write)
+
+    def _write(self):
+        if self.writer.is_closing():
+            self.outbox.clear()
+            return
+        data = self.take_data()
+        if not data or self.dropped:
+            return
+        self.writer.write(data)
+        metrics.observe_write()
+        buffered = self.writer.transport.get_write_buffer_size()
+        if buffered > WRITE_BUFFER_LIMIT:
+            self.drop_slow_consumer(f"{buffered} bytes buffered")
+
+    def abort(self):
+        if threading.get_ident() == self.loop_thread:
+            self.writer.transport.abort()
+        else:
+            self.loop.call_soon_threadsafe(self.writer.transport.abort)
+
+    def close(self):
+        if threading.get_ident() == self.loop_thread:
+            self.writer.close()
+        else:
+            self.loop.call_soon_threadsafe(self.writer.close)
+
+async def handle_client_async(reader, writer, conn=None, player_id=None, room=None, unread=b''):
+    addr = writer.get_extra_info('peername')
+    if player_id is None:
+        player_id = next_player_id()
+    if conn is None:
+        conn = AsyncConnection(writer)
+    print(f"Connected by {addr}, assigned ID: {player_id}")
+    decoder = FrameDecoder()
+    keep_open = True
+    leftover = []
+    metrics.connection_opened()
+    try:
+        while keep_open:
+            data = unread or await reader.read(BUFFER_SIZE)
+            unread = b''
             if not data:
                 break
-            request = pickle.loads(data)
-            action = request.get('action')
-
-            with lock:
-                if action == 'set_player_info':
-                    name = request.get('name')
-                    difficulty = request.get('difficulty')
-
-                    game_state.players[player_id] = {
-                        'conn': conn,
-                        'addr': addr,
-                        'name': name,
-                        'difficulty': difficulty,
-                        'ready_to_play': False,
-                        'restart_requested': False
-                    }
-                    print(f"Player {name} ({player_id}) set difficulty to {difficulty}")
-
-                    if len(game_state.players) == 2:
-                        p_ids = list(game_state.players.keys())
-                        other_player_id = p_ids[0] if p_ids[1] == player_id else p_ids[1]
-                        
-                        if game_state.players[other_player_id]['difficulty'] == 'easy':
-                            game_state.players[player_id]['difficulty'] = 'easy'
-                            print(f"Player {name} difficulty set to 'easy' to match opponent.")
-                        elif game_state.players[player_id]['difficulty'] == 'easy':
-                            game_state.players[other_player_id]['difficulty'] = 'easy'
-                            print(f"Player {game_state.players[other_player_id]['name']} difficulty set to 'easy' to match new player.")
-
-
-                    if len(game_state.players) == 1:
-                        send_response(conn, {'status': 'waiting_for_other_player', 'message': 'Oczekiwanie na drugiego gracza...'})
-                    elif len(game_state.players) == 2:
-                        if game_state.prepare_new_game():
-                            for pid, player_info in game_state.players.items():
-                                opponent_id = game_state.get_opponent_id(pid)
-                                send_response(player_info['conn'], {
-                                    'status': 'start_placement',
-                                    'your_name': player_info['name'],
-                                    'opponent_name': game_state.players[opponent_id]['name'],
-                                    'board_size': player_info['board_size'],
-                                    'ships_to_place': player_info['ships_to_place']
-                                })
-                        else:
-                            print("Error preparing new game state.")
-
-                elif action == 'place_ships':
-                    ships_data = request.get('ships')
-                    if game_state.place_ship(player_id, ships_data):
-                        print(f"Player {player_id} successfully placed ships.")
-                        if game_state.check_all_players_ready_for_placement():
-                            print("Both players ready for placement. Starting game!")
-                            player_ids = list(game_state.players.keys())
-                            game_state.current_player_turn = random.choice(player_ids)
-                            game_state.game_started = True
-
-                            for pid, player_info in game_state.players.items():
-                                opponent_id = game_state.get_opponent_id(pid)
-                                send_response(player_info['conn'], {
-                                    'status': 'game_start',
-                                    'your_turn': (pid == game_state.current_player_turn),
-                                    'my_initial_board': game_state.player_boards[pid]
-                                })
-                        else:
-                            send_response(conn, {'status': 'waiting_for_other_player', 'message': 'Czekanie na przeciwnika...'})
-                    else:
-                        send_response(conn, {'status': 'error', 'message': 'Nieprawidłowe rozmieszczenie statków. Spróbuj ponownie.'})
-
-                elif action == 'shoot':
-                    row = request.get('row')
-                    col = request.get('col')
-                    if player_id == game_state.current_player_turn and not game_state.game_over:
-                        shot_response = game_state.process_shot(player_id, row, col)
-                        send_response(conn, shot_response)
-                        
-                        opponent_id = game_state.get_opponent_id(player_id)
-                        if opponent_id:
-                            opponent_shot_info = {
-                                'status': 'opponent_shot',
-                                'row': row,
-                                'col': col,
-                                'result': shot_response['result'],
-                                'ship_sunk': shot_response['ship_sunk'],
-                                'your_board_state': game_state.player_boards[opponent_id]
-                            }
-                            send_response(game_state.players[opponent_id]['conn'], opponent_shot_info)
-                            
-                            if not shot_response['your_turn_continues'] and not game_state.game_over:
-                                game_state.current_player_turn = opponent_id
-                                send_response(conn, {'status': 'turn_update', 'your_turn': False})
-                                send_response(game_state.players[opponent_id]['conn'], {'status': 'turn_update', 'your_turn': True})
-                            elif game_state.game_over:
-                                for pid, player_info in game_state.players.items():
-                                    send_response(player_info['conn'], {
-                                        'status': 'game_over',
-                                        'winner': game_state.winner,
-                                        'scoreboard': game_state.scoreboard
-                                    })
-                    else:
-                        send_response(conn, {'status': 'error', 'message': 'To nie Twoja tura lub gra się zakończyła.'})
-
-                elif action == 'request_restart':
-                    game_state.players[player_id]['restart_requested'] = True
-                    opponent_id = game_state.get_opponent_id(player_id)
-                    if opponent_id:
-                        if game_state.players[opponent_id]['restart_requested']:
-                            print("Both players requested restart. Resetting game.")
-                            game_state.reset_game()
-                            if game_state.prepare_new_game():
-                                for pid, player_info in game_state.players.items():
-                                    opponent_of_pid = game_state.get_opponent_id(pid)
-                                    send_response(player_info['conn'], {
-                                        'status': 'start_placement',
-                                        'your_name': player_info['name'],
-                                        'opponent_name': game_state.players[opponent_of_pid]['name'],
-                                        'board_size': player_info['board_size'],
-                                        'ships_to_place': player_info['ships_to_place']
-                                    })
-                            else:
-                                print("Error preparing new game after restart request.")
-                        else:
-                            send_response(game_state.players[opponent_id]['conn'], {
-                                'status': 'restart_request',
-                                'from': game_state.players[player_id]['name']
-                            })
-                            send_response(conn, {'status': 'message', 'message': 'Oczekiwanie na odpowiedź przeciwnika...'})
-                    else:
-                        send_response(conn, {'status': 'error', 'message': 'Nie ma przeciwnika do zrestartowania gry.'})
-                
-                elif action == 'accept_restart':
-                    game_state.players[player_id]['restart_requested'] = True
-                    opponent_id = game_state.get_opponent_id(player_id)
-                    if opponent_id and game_state.players[opponent_id]['restart_requested']:
-                        print("Both players accepted restart. Resetting game.")
-                        game_state.reset_game()
-                        if game_state.prepare_new_game():
-                            for pid, player_info in game_state.players.items():
-                                opponent_of_pid = game_state.get_opponent_id(pid)
-                                send_response(player_info['conn'], {
-                                    'status': 'start_placement',
-                                    'your_name': player_info['name'],
-                                    'opponent_name': game_state.players[opponent_of_pid]['name'],
-                                    'board_size': player_info['board_size'],
-                                    'ships_to_place': player_info['ships_to_place']
-                                })
-                        else:
-                            print("Error preparing new game after restart acceptance.")
-                    else:
-                         send_response(conn, {'status': 'message', 'message': 'Czekam na akceptację przeciwnika...'})
-
-                elif action == 'decline_restart':
-                    opponent_id = game_state.get_opponent_id(player_id)
-                    if opponent_id:
-                        game_state.players[player_id]['restart_requested'] = False
-                        send_response(game_state.players[opponent_id]['conn'], {
-                            'status': 'restart_declined',
-                            'from': game_state.players[player_id]['name']
-                        })
-                        send_response(conn, {'status': 'message', 'message': 'Odrzuciłeś prośbę o restart.'})
-                    else:
-                        send_response(conn, {'status': 'error', 'message': 'Brak przeciwnika.'})
-
-                elif action == 'disconnect':
-                    print(f"Player {player_id} disconnected gracefully.")
-                    if player_id in game_state.players:
-                        del game_state.players[player_id]
-                    opponent_id = game_state.get_opponent_id(player_id)
-                    if opponent_id and opponent_id in game_state.players:
-                        send_response(game_state.players[opponent_id]['conn'], {'status': 'opponent_disconnected'})
-                        game_state.players[opponent_id]['restart_requested'] = False
+            requests = decode_requests(decoder, data)
+            for index, request in enumerate(requests):
+                room, keep_open = dispatch_request(room, conn, addr, player_id, request)
+                if not keep_open:
+                    leftover = requests[index + 1:]
                     break
+            await writer.drain()
+        if not keep_open and room is None and shard_link is not None:
+            writer.transport.pause_reading()
+            writer.transport.set_write_buffer_limits(0)
+            await writer.drain()
+            reader.feed_eof()
+            unread = unread_bytes(leftover, decoder) + await reader.read()
+            shard_link.hand_off(player_id, writer.get_extra_info('socket'), unread)
     except Exception as e:
         print(f"Error handling client {addr}: {e}")
     finally:
-        with lock:
-            if player_id in game_state.players:
-                print(f"Client {addr} ({player_id}) disconnected unexpectedly.")
-                del game_state.players[player_id]
-                opponent_id = game_state.get_opponent_id(player_id)
-                if opponent_id and opponent_id in game_state.players:
-                    send_response(game_state.players[opponent_id]['conn'], {'status': 'opponent_disconnected'})
-                    game_state.players[opponent_id]['restart_requested'] = False
+        metrics.connection_closed()
+        release_player(room, addr, player_id)
         try:
-            conn.close()
+            writer.close()
         except OSError as e:
             print(f"Error closing connection for {addr}: {e}")
 
-def start_server():
+def bind_server_socket():
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
@@ -451,35 +1145,455 @@ def start_server():
 
     if not found_port:
         print(f"ERROR: Could not find an available port in range {PORT_RANGE_START}-{PORT_RANGE_END}. Exiting.")
-        return
+        server_socket.close()
+        return None, None
 
-    server_socket.listen(2)
-    print(f"Server listening on {HOST}:{found_port}")
+    server_socket.listen(SERVER_BACKLOG)
+    print(f"Server listening on {HOST}:{found_port} (up to {room_manager.max_rooms} rooms)")
+    return server_socket, found_port
 
-    global player_counter
+def bind_shard_socket(port):
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    server_socket.bind((HOST, port))
+    server_socket.listen(SERVER_BACKLOG)
+    print(f"Server listening on {HOST}:{port} with SO_REUSEPORT (up to {room_manager.max_rooms} rooms)")
+    return server_socket
+
+def serve_threaded(server_socket):
+    if shard_link is not None:
+        shard_link.start()
     while True:
         try:
             conn, addr = server_socket.accept()
-            with lock:
-                if len(game_state.players) < 2:
-                    player_id = f"player_{player_counter}"
-                    player_counter += 1
-                    
-                    client_thread = threading.Thread(target=handle_client, args=(conn, addr, player_id))
-                    client_thread.daemon = True
-                    client_thread.start()
-                else:
-                    print(f"Connection from {addr} rejected. Server is full.")
-                    send_response(conn, {'status': 'server_full', 'message': 'Serwer jest pełny. Spróbuj ponownie później.'})
-                    conn.close()
+            player_id = next_player_id()
+
+            client_thread = threading.Thread(target=handle_client, args=(SocketConnection(conn), addr, player_id))
+            client_thread.daemon = True
+            client_thread.start()
         except socket.timeout:
             pass
         except Exception as e:
             print(f"Error accepting connection: {e}")
             break
 
-    server_socket.close()
-    print("Server shut down.")
+async def serve_asyncio(server_socket):
+    if shard_link is not None:
+        shard_link.start(asyncio.get_running_loop())
+    server = await asyncio.start_server(handle_client_async, sock=server_socket, limit=BUFFER_SIZE)
+    async with server:
+        await server.serve_forever()
+
+def serve(mode, server_socket):
+    if mode == 'asyncio':
+        asyncio.run(serve_asyncio(server_socket))
+    else:
+        serve_threaded(server_socket)
+
+def send_packet(channel, message, fds=()):
+    socket.send_fds(channel, [pickle.dumps(message)], list(fds))
+
+def receive_packet(channel):
+    data, fds, _, _ = socket.recv_fds(channel, SHARD_PACKET_SIZE, PLAYERS_PER_ROOM)
+    if not data:
+        return None, fds
+    return pickle.loads(data), fds
+
+class ShardLink:
+    """
+    Łącze procesu roboczego z koordynatorem (para gniazd AF_UNIX SOCK_SEQPACKET, wiadomości
+    w pickle, deskryptory przez SCM_RIGHTS). Zastępuje w procesie roboczym Matchmakera:
+    gracz szukający przeciwnika jest oddawany koordynatorowi razem z gniazdem, a z powrotem
+    przychodzą gotowe pary, dla których ten proces tworzy pokój i prowadzi grę.
+    """
+    def __init__(self, channel, room_manager):
+        self.channel = channel
+        self.room_manager = room_manager
+        self.leaving = {}
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.loop = None
+        self.tasks = set()
+
+    def start(self, loop=None):
+        self.loop = loop
+        threading.Thread(target=self._listen, daemon=True).start()
+
+    def send(self, message, fds=()):
+        with self.send_lock:
+            send_packet(self.channel, message, fds)
+
+    def enqueue(self, player_id, player_info, front=False):
+        with self.lock:
+            self.leaving[player_id] = player_info
+        return False
+
+    def is_queued(self, player_id):
+        return False
+
+    def cancel(self, player_id):
+        with self.lock:
+            self.leaving.pop(player_id, None)
+        return self.room_manager.get_room(player_id)
+
+    def stats(self):
+        return {}
+
+    def hand_off(self, player_id, sock, unread):
+        with self.lock:
+            player_info = self.leaving.pop(player_id, None)
+        if player_info is None:
+            return False
+        self.send({'type': 'queue', 'player_id': player_id, 'name': player_info['name'],
+                   'difficulty': player_info['difficulty'], 'addr': player_info['addr'], 'unread': unread},
+                  [sock.fileno()])
+        return True
+
+    def publish_win(self, player_name):
+        try:
+            self.send({'type': 'win', 'name': player_name})
+        except OSError as e:
+            print(f"Error sending a win to the coordinator: {e}")
+
+    def room_closed(self):
+        try:
+            self.send({'type': 'room_closed'})
+        except OSError as e:
+            print(f"Error notifying the coordinator about a closed room: {e}")
+
+    def _adopt(self, players, socks):
+        if self.loop is None:
+            adopt_match(players, socks)
+            return
+        def schedule():
+            task = asyncio.ensure_future(adopt_match_async(players, socks))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        self.loop.call_soon_threadsafe(schedule)
+
+    def _listen(self):
+        while True:
+            try:
+                message, fds = receive_packet(self.channel)
+            except OSError as e:
+                print(f"Error reading from the coordinator: {e}")
+                message = None
+            if message is None:
+                print("Coordinator is gone, shutting down worker.")
+                os.kill(os.getpid(), signal.SIGINT)
+                return
+            if message['type'] == 'match':
+                self._adopt(message['players'], [socket.socket(fileno=fd) for fd in fds])
+            elif message['type'] == 'win':
+                self.room_manager.scoreboard.apply_win(message['name'])
+
+def adopt_match(players, socks):
+    room = room_manager.create_room([player_id for player_id, _, _ in players])
+    if room is None:
+        print("No free room for a match from the coordinator.")
+        for sock in socks:
+            sock.close()
+        shard_link.room_closed()
+        return
+    for sock in socks:
+        sock.setblocking(True)
+    conns = [SocketConnection(sock) for sock in socks]
+    with room.locked():
+        begin_match(room, [(player_id, new_player_info(conn, info['addr'], info['name'], info['difficulty']))
+                           for (player_id, info, _), conn in zip(players, conns)])
+    for (player_id, info, unread), conn in zip(players, conns):
+        client_thread = threading.Thread(target=handle_client, args=(conn, info['addr'], player_id, room, unread))
+        client_thread.daemon = True
+        client_thread.start()
+
+async def adopt_match_async(players, socks):
+    streams = [await asyncio.open_connection(sock=sock, limit=BUFFER_SIZE) for sock in socks]
+    room = room_manager.create_room([player_id for player_id, _, _ in players])
+    if room is None:
+        print("No free room for a match from the coordinator.")
+        for _, writer in streams:
+            writer.close()
+        shard_link.room_closed()
+        return
+    conns = [AsyncConnection(writer) for _, writer in streams]
+    with room.locked():
+        begin_match(room, [(player_id, new_player_info(conn, info['addr'], info['name'], info['difficulty']))
+                           for (player_id, info, _), conn in zip(players, conns)])
+    await asyncio.gather(*(handle_client_async(reader, writer, conn, player_id, room, unread)
+                           for (player_id, _, unread), (reader, writer), conn in zip(players, streams, conns)))
+
+class ShardCoordinator:
+    """
+    Proces nadrzędny trybu wieloprocesowego. Nie prowadzi gier: trzyma gniazda graczy
+    oddanych przez procesy robocze w kolejkach ShardMatchmakera (wspólnych dla wszystkich
+    procesów) i oddaje parę procesowi z najmniejszą liczbą pokoi. Jako jedyny zapisuje
+    ranking - wygrane zgłoszone przez proces roboczy zapisuje i rozsyła do pozostałych.
+    """
+    def __init__(self, channels, scoreboard, max_rooms):
+        self.channels = channels
+        self.scoreboard = scoreboard
+        self.max_rooms = max_rooms
+        self.rooms = [0] * len(channels)
+        self.alive = [True] * len(channels)
+        self.send_locks = [threading.Lock() for _ in channels]
+        self.lobby = {}
+        self.lock = threading.Lock()
+        self.selector = selectors.DefaultSelector()
+        self.matchmaker = ShardMatchmaker(self)
+
+    def create_room(self, player_ids):
+        with self.lock:
+            workers = [worker for worker, rooms in enumerate(self.rooms)
+                       if self.alive[worker] and rooms < self.max_rooms]
+            if not workers:
+                return None
+            worker = min(workers, key=self.rooms.__getitem__)
+            self.rooms[worker] += 1
+            return worker
+
+    def get_room(self, player_id):
+        return None
+
+    def stats(self):
+        with self.lock:
+            stats = {'rooms': sum(self.rooms), 'workers': sum(self.alive), 'players': len(self.lobby)}
+        stats.update(self.matchmaker.stats())
+        return stats
+
+    def _send(self, worker, message, fds=()):
+        with self.send_locks[worker]:
+            send_packet(self.channels[worker], message, fds)
+
+    def wait_ready(self):
+        for worker, channel in enumerate(self.channels):
+            message, _ = receive_packet(channel)
+            if message is None or message['type'] != 'ready':
+                print(f"Worker {worker} failed to start.")
+                return False
+        return True
+
+    def send_match(self, worker, first, second):
+        with self.lock:
+            entries = [self.lobby[player_id] for player_id, _ in (first, second)]
+        for conn, _ in entries:
+            conn.flush(wait=True)
+        players = [(player_id, {'name': player_info['name'], 'difficulty': player_info['difficulty'],
+                                'addr': player_info['addr']}, bytes(decoder.buffer))
+                   for (player_id, player_info), (_, decoder) in zip((first, second), entries)]
+        try:
+            self._send(worker, {'type': 'match', 'players': players}, [conn.fileno() for conn, _ in entries])
+        except OSError as e:
+            print(f"Error handing a match to worker {worker}: {e}")
+            self._worker_lost(worker)
+            return False
+        for player_id, _ in (first, second):
+            self._leave_lobby(player_id)
+        return True
+
+    def _leave_lobby(self, player_id):
+        with self.lock:
+            conn, _ = self.lobby.pop(player_id)
+            self.selector.unregister(conn.sock)
+        conn.close()
+
+    def _worker_lost(self, worker):
+        with self.lock:
+            if not self.alive[worker]:
+                return
+            self.alive[worker] = False
+            self.rooms[worker] = 0
+            self.selector.unregister(self.channels[worker])
+        print(f"Worker {worker} is gone ({sum(self.alive)} left)")
+
+    def _admit(self, message, fds):
+        sock = socket.socket(fileno=fds[0])
+        sock.setblocking(True)
+        conn = SocketConnection(sock)
+        player_id = message['player_id']
+        decoder = FrameDecoder()
+        try:
+            requests = decoder.feed(message['unread'])
+        except FrameError as e:
+            print(f"Error decoding data handed over with {player_id}: {e}")
+            sock.close()
+            return
+        if any(request.get('action') == 'disconnect' for request in requests):
+            sock.close()
+            return
+        for _ in requests:
+            send_response(conn, {'status': 'error', 'message': 'Czekasz w kolejce na przeciwnika.'})
+        with self.lock:
+            self.lobby[player_id] = (conn, decoder)
+            self.selector.register(sock, selectors.EVENT_READ, (self._read_lobby, player_id))
+        self.matchmaker.enqueue(player_id, new_player_info(conn, message['addr'], message['name'], message['difficulty']))
+
+    def _read_lobby(self, player_id):
+        with self.matchmaker.condition:
+            if not self.matchmaker.is_queued(player_id):
+                return
+            conn, decoder = self.lobby[player_id]
+            try:
+                data = conn.sock.recv(BUFFER_SIZE)
+                requests = decoder.feed(data) if data else None
+            except (OSError, FrameError) as e:
+                print(f"Error reading from queued player {player_id}: {e}")
+                requests = None
+            if requests is None or any(request.get('action') == 'disconnect' for request in requests):
+                self.matchmaker.cancel(player_id)
+                self._leave_lobby(player_id)
+                print(f"Player {player_id} left the queue.")
+                return
+            for _ in requests:
+                queue_response(conn, {'status': 'error', 'message': 'Czekasz w kolejce na przeciwnika.'})
+        conn.flush()
+
+    def _read_worker(self, worker):
+        try:
+            message, fds = receive_packet(self.channels[worker])
+        except OSError as e:
+            print(f"Error reading from worker {worker}: {e}")
+            message, fds = None, []
+        if message is None:
+            self._worker_lost(worker)
+        elif message['type'] == 'queue':
+            self._admit(message, fds)
+        elif message['type'] == 'win':
+            self.scoreboard.add_win(message['name'])
+            for other in range(len(self.channels)):
+                if other != worker and self.alive[other]:
+                    try:
+                        self._send(other, message)
+                    except OSError as e:
+                        print(f"Error forwarding a win to worker {other}: {e}")
+        elif message['type'] == 'room_closed':
+            with self.lock:
+                self.rooms[worker] = max(0, self.rooms[worker] - 1)
+
+    def run(self):
+        for worker, channel in enumerate(self.channels):
+            self.selector.register(channel, selectors.EVENT_READ, (self._read_worker, worker))
+        while any(self.alive):
+            for key, _ in self.selector.select():
+                handler, arg = key.data
+                handler(arg)
+        print("All workers are gone.")
+
+def run_worker(index, mode, server_socket, port, channel, inherited_channels, max_rooms,
+               metrics_port, metrics_file, metrics_interval):
+    global matchmaker, shard_link, player_id_prefix
+    for inherited in inherited_channels:
+        inherited.close()
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    shard_link = matchmaker = ShardLink(channel, room_manager)
+    player_id_prefix = f"w{index}_player"
+    room_manager.max_rooms = max_rooms
+    room_manager.on_room_closed = shard_link.room_closed
+    room_manager.scoreboard = ScoreboardReplica(room_manager.scoreboard.path, shard_link.publish_win)
+    if server_socket is None:
+        server_socket = bind_shard_socket(port)
+    export_metrics(metrics_port, metrics_file, metrics_interval)
+    print(f"Worker {index} (pid {os.getpid()}) running in {mode} mode")
+    shard_link.send({'type': 'ready'})
+    try:
+        serve(mode, server_socket)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server_socket.close()
+
+def start_sharded_server(mode=SERVER_MODE, workers=2, reuse_port=False, metrics_port=None,
+                         metrics_file=None, metrics_interval=METRICS_DUMP_INTERVAL):
+    global matchmaker
+    if mode not in SERVER_MODES:
+        raise ValueError(f"Unknown server mode: {mode}")
+    server_socket, port = bind_server_socket()
+    if server_socket is None:
+        return
+    if reuse_port:
+        server_socket.close()
+        server_socket = None
+
+    max_rooms = -(-room_manager.max_rooms // workers)
+    context = multiprocessing.get_context('fork')
+    channels = []
+    processes = []
+    for index in range(workers):
+        channel, worker_channel = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        process = context.Process(target=run_worker, name=f"shard-{index}", daemon=True, args=(
+            index, mode, server_socket, port, worker_channel, channels + [channel], max_rooms,
+            None if metrics_port is None else metrics_port + index + 1,
+            metrics_file and f"{metrics_file}.{index}", metrics_interval))
+        process.start()
+        worker_channel.close()
+        channels.append(channel)
+        processes.append(process)
+    if server_socket is not None:
+        server_socket.close()
+
+    coordinator = ShardCoordinator(channels, room_manager.scoreboard, max_rooms)
+    matchmaker = coordinator.matchmaker
+    metrics.gauges = coordinator.stats
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        if coordinator.wait_ready():
+            export_metrics(metrics_port, metrics_file, metrics_interval)
+            print(f"Server running in {mode} mode with {workers} worker processes"
+                  f"{' (SO_REUSEPORT)' if reuse_port else ''}")
+            coordinator.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for channel in channels:
+            channel.close()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        room_manager.scoreboard.close()
+        print("Server shut down.")
+
+def export_metrics(port=None, path=None, interval=METRICS_DUMP_INTERVAL):
+    if port is not None:
+        start_http_endpoint(metrics, HOST, port)
+    if path:
+        start_file_dump(metrics, path, interval)
+
+def start_server(mode=SERVER_MODE):
+    if mode not in SERVER_MODES:
+        raise ValueError(f"Unknown server mode: {mode}")
+    server_socket, port = bind_server_socket()
+    if server_socket is None:
+        return
+
+    print(f"Server running in {mode} mode")
+    try:
+        serve(mode, server_socket)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server_socket.close()
+        room_manager.scoreboard.close()
+        print("Server shut down.")
 
 if __name__ == "__main__":
-    start_server()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Battleship server")
+    parser.add_argument('--mode', choices=SERVER_MODES, default=SERVER_MODE,
+                        help="networking core: one thread per connection or a single asyncio event loop")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="serve counters and latency histograms as text on http://127.0.0.1:PORT/metrics")
+    parser.add_argument('--metrics-file', default=None,
+                        help="periodically write the same metrics text to this file")
+    parser.add_argument('--metrics-interval', type=float, default=METRICS_DUMP_INTERVAL)
+    parser.add_argument('--workers', type=int, default=1,
+                        help="worker processes sharing the port; each runs its own rooms, a coordinator pairs players "
+                             "(worker N exports metrics on PORT+N+1 and FILE.N)")
+    parser.add_argument('--reuse-port', action='store_true',
+                        help="with --workers: give every worker its own SO_REUSEPORT socket instead of one shared listening socket")
+    args = parser.parse_args()
+    if args.workers > 1:
+        start_sharded_server(args.mode, args.workers, args.reuse_port,
+                             args.metrics_port, args.metrics_file, args.metrics_interval)
+    else:
+        export_metrics(args.metrics_port, args.metrics_file, args.metrics_interval)
+        start_server(args.mode)
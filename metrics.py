@@ -0,0 +1,227 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+METRICS_PREFIX = 'battleship'
+METRICS_DUMP_INTERVAL = 10
+
+
+class Histogram:
+    """
+    Histogram o stałych kubełkach (górne granice w sekundach) z sumą i maksimum.
+    Nie blokuje sam - synchronizację zapewnia ServerMetrics.
+    """
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, fraction):
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.max
+
+
+class ServerMetrics:
+    """
+    Liczniki i histogramy serwera: czas obsługi każdej akcji, czekanie na blokady i czas
+    ich trzymania, czekanie w kolejce matchmakingu, kodowanie/dekodowanie ramek, bajty,
+    zapisy i paczki ramek ('batch'), połączenia (także rozłączone jako zbyt wolne)
+    i zakończone gry.
+    Pokoje i graczy odczytuje w chwili eksportu z przekazanej funkcji gauges().
+    """
+    def __init__(self, gauges=None):
+        self.lock = threading.Lock()
+        self.gauges = gauges
+        self.started = time.time()
+        self.actions = {}
+        self.lock_waits = {}
+        self.lock_holds = {}
+        self.queue_waits = {}
+        self.codec = {'encode': Histogram(), 'decode': Histogram()}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.frames_in = 0
+        self.frames_out = 0
+        self.writes = 0
+        self.batches = 0
+        self.batched_frames = 0
+        self.slow_consumers = 0
+        self.connections = 0
+        self.connections_total = 0
+        self.games_finished = 0
+
+    def observe_action(self, action, seconds):
+        with self.lock:
+            histogram = self.actions.get(action)
+            if histogram is None:
+                histogram = self.actions[action] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_lock_wait(self, name, seconds):
+        with self.lock:
+            histogram = self.lock_waits.get(name)
+            if histogram is None:
+                histogram = self.lock_waits[name] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_lock_hold(self, name, seconds):
+        with self.lock:
+            histogram = self.lock_holds.get(name)
+            if histogram is None:
+                histogram = self.lock_holds[name] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_queue_wait(self, difficulty, seconds):
+        with self.lock:
+            histogram = self.queue_waits.get(difficulty)
+            if histogram is None:
+                histogram = self.queue_waits[difficulty] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_decode(self, size, frames, seconds):
+        with self.lock:
+            self.bytes_in += size
+            self.frames_in += frames
+            self.codec['decode'].observe(seconds)
+
+    def observe_encode(self, size, seconds):
+        with self.lock:
+            self.bytes_out += size
+            self.frames_out += 1
+            self.codec['encode'].observe(seconds)
+
+    def observe_batch(self, frames, overhead):
+        with self.lock:
+            self.batches += 1
+            self.batched_frames += frames
+            self.bytes_out += overhead
+
+    def observe_write(self):
+        with self.lock:
+            self.writes += 1
+
+    def slow_consumer_dropped(self):
+        with self.lock:
+            self.slow_consumers += 1
+
+    def connection_opened(self):
+        with self.lock:
+            self.connections += 1
+            self.connections_total += 1
+
+    def connection_closed(self):
+        with self.lock:
+            self.connections -= 1
+
+    def game_finished(self):
+        with self.lock:
+            self.games_finished += 1
+
+    def _histogram_lines(self, name, label, histograms):
+        lines = []
+        for key, histogram in sorted(histograms.items()):
+            labels = f'{label}="{key}"'
+            cumulative = 0
+            for bound, count in zip(histogram.bounds, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram.total:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+            lines.append(f'{name}_max{{{labels}}} {histogram.max:.6f}')
+            lines.append(f'{name}_p50{{{labels}}} {histogram.quantile(0.5)}')
+            lines.append(f'{name}_p99{{{labels}}} {histogram.quantile(0.99)}')
+        return lines
+
+    def render(self):
+        """
+        Zrzut w formacie tekstowym zgodnym z Prometheusem (jedna metryka na linię).
+        """
+        gauges = self.gauges() if self.gauges else {}
+        prefix = METRICS_PREFIX
+        with self.lock:
+            lines = [
+                f'{prefix}_uptime_seconds {time.time() - self.started:.1f}',
+                f'{prefix}_connections {self.connections}',
+                f'{prefix}_connections_total {self.connections_total}',
+                f'{prefix}_games_finished_total {self.games_finished}',
+                f'{prefix}_bytes_in_total {self.bytes_in}',
+                f'{prefix}_bytes_out_total {self.bytes_out}',
+                f'{prefix}_frames_in_total {self.frames_in}',
+                f'{prefix}_frames_out_total {self.frames_out}',
+                f'{prefix}_writes_total {self.writes}',
+                f'{prefix}_batches_total {self.batches}',
+                f'{prefix}_batched_frames_total {self.batched_frames}',
+                f'{prefix}_slow_consumers_total {self.slow_consumers}',
+            ]
+            lines += [f'{prefix}_{name} {value}' for name, value in sorted(gauges.items())]
+            lines += self._histogram_lines(f'{prefix}_action_seconds', 'action', self.actions)
+            lines += self._histogram_lines(f'{prefix}_lock_wait_seconds', 'lock', self.lock_waits)
+            lines += self._histogram_lines(f'{prefix}_lock_hold_seconds', 'lock', self.lock_holds)
+            lines += self._histogram_lines(f'{prefix}_queue_wait_seconds', 'difficulty', self.queue_waits)
+            lines += self._histogram_lines(f'{prefix}_codec_seconds', 'op', self.codec)
+        return '\n'.join(lines) + '\n'
+
+
+def start_http_endpoint(metrics, host, port):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics available at http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def write_metrics_file(metrics, path):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(metrics.render())
+    os.replace(temp_path, path)
+
+
+def start_file_dump(metrics, path, interval=METRICS_DUMP_INTERVAL):
+    def dump_loop():
+        while True:
+            time.sleep(interval)
+            try:
+                write_metrics_file(metrics, path)
+            except OSError as e:
+                print(f"Error writing metrics to {path}: {e}")
+
+    threading.Thread(target=dump_loop, daemon=True).start()
+    print(f"Writing metrics to {path} every {interval}s")
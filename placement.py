@@ -0,0 +1,66 @@
+from functools import lru_cache
+
+
+def ship_cells(start_row, start_col, ship_size, orientation):
+    if orientation == 'vertical':
+        return [(start_row + i, start_col) for i in range(ship_size)]
+    return [(start_row, start_col + i) for i in range(ship_size)]
+
+
+@lru_cache(maxsize=None)
+def board_masks(board_size):
+    """
+    Maski zależne tylko od rozmiaru planszy: cała plansza, plansza bez pierwszej
+    i bez ostatniej kolumny (do przesunięć w poziomie bez zawijania między wierszami).
+    """
+    full = (1 << (board_size * board_size)) - 1
+    first_col = 0
+    for r in range(board_size):
+        first_col |= 1 << (r * board_size)
+    last_col = first_col << (board_size - 1)
+    return full, full & ~first_col, full & ~last_col
+
+
+@lru_cache(maxsize=None)
+def vertical_run(board_size, ship_size):
+    mask = 0
+    for i in range(ship_size):
+        mask |= 1 << (i * board_size)
+    return mask
+
+
+def dilate(mask, board_size):
+    full, not_first_col, not_last_col = board_masks(board_size)
+    row_mask = mask | ((mask << 1) & not_first_col) | ((mask >> 1) & not_last_col)
+    return (row_mask | (row_mask << board_size) | (row_mask >> board_size)) & full
+
+
+class PlacementValidator:
+    """
+    Trzyma maskę pól zakazanych (statki + ich otoczenie), aktualizowaną po każdym
+    postawionym statku. Sprawdzenie kandydata to jedno AND na intach.
+    Używany przez serwer (GameState.place_ship) i klienta (podgląd i kliknięcia).
+    """
+    def __init__(self, board_size):
+        self.board_size = board_size
+        self.occupied = 0
+        self.forbidden = 0
+
+    def ship_mask(self, start_row, start_col, ship_size, orientation):
+        size = self.board_size
+        if start_row < 0 or start_col < 0:
+            return None
+        if orientation == 'vertical':
+            if start_row + ship_size > size or start_col >= size:
+                return None
+            return vertical_run(size, ship_size) << (start_row * size + start_col)
+        if start_col + ship_size > size or start_row >= size:
+            return None
+        return ((1 << ship_size) - 1) << (start_row * size + start_col)
+
+    def can_place(self, mask):
+        return mask is not None and not mask & self.forbidden
+
+    def place(self, mask):
+        self.occupied |= mask
+        self.forbidden |= dilate(mask, self.board_size)
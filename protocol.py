@@ -0,0 +1,350 @@
+import struct
+from collections import deque
+
+PROTOCOL_VERSION = 4
+BUFFER_SIZE = 4096
+MAX_FRAME_SIZE = 1024 * 1024
+
+FRAME_HEADER = struct.Struct('!IBB')
+LENGTH_PREFIX = struct.Struct('!I')
+STRING_LENGTH = struct.Struct('!H')
+SCORE_ENTRY = struct.Struct('!I')
+NONE_STRING = 0xFFFF
+# Wpis paczki to ramka bez długości i wersji (typ + pola), poprzedzona 2-bajtową długością.
+BATCH_ENTRY_OFFSET = LENGTH_PREFIX.size + 1
+MAX_BATCH_ENTRY = 0xFFFF
+
+CELL_CHARS = '.SXO'
+CELL_CODES = {char: code for code, char in enumerate(CELL_CHARS)}
+RESULTS = ('miss', 'hit')
+ORIENTATIONS = ('horizontal', 'vertical')
+
+FIXED_FIELDS = {'u8': 'B', 'u32': 'I', 'bool': '?', 'result': 'B'}
+
+# Kolejność wpisów wyznacza numer typu wiadomości na łączu - nowe typy dopisuj na końcu,
+# a każdą niezgodną zmianę układu pól oznacz podbiciem PROTOCOL_VERSION.
+MESSAGE_TYPES = [
+    ('action', 'set_player_info', [('name', 'str'), ('difficulty', 'str')]),
+    ('action', 'place_ships', [('ships', 'placements')]),
+    ('action', 'shoot', [('row', 'u8'), ('col', 'u8')]),
+    ('action', 'request_restart', []),
+    ('action', 'accept_restart', []),
+    ('action', 'decline_restart', []),
+    ('action', 'disconnect', []),
+    ('action', 'exit_game', []),
+    ('status', 'waiting_for_other_player', [('message', 'str')]),
+    ('status', 'start_placement', [('your_name', 'str'), ('opponent_name', 'str'), ('board_size', 'u8'), ('ships_to_place', 'sizes')]),
+    ('status', 'game_start', [('your_turn', 'bool'), ('my_initial_board', 'board')]),
+    ('status', 'turn_update', [('your_turn', 'bool')]),
+    ('status', 'shot_result', [('result', 'result'), ('row', 'u8'), ('col', 'u8'), ('ship_sunk', 'bool'),
+                               ('your_turn_continues', 'bool'), ('game_over', 'bool'), ('winner', 'opt_str')]),
+    ('status', 'opponent_shot', [('row', 'u8'), ('col', 'u8'), ('result', 'result'), ('ship_sunk', 'bool'), ('seq', 'u32')]),
+    ('status', 'invalid_shot', [('message', 'str')]),
+    ('status', 'error', [('message', 'str')]),
+    ('status', 'game_over', [('winner', 'opt_str'), ('winner_rank', 'u32'), ('scoreboard', 'scoreboard')]),
+    ('status', 'restart_request', [('from', 'str')]),
+    ('status', 'restart_declined', [('from', 'str')]),
+    ('status', 'message', [('message', 'str')]),
+    ('status', 'opponent_disconnected', []),
+    ('status', 'server_full', [('message', 'str')]),
+    ('action', 'request_board_snapshot', []),
+    ('status', 'board_snapshot', [('seq', 'u32'), ('board', 'board')]),
+    ('status', 'queue_position', [('position', 'u32'), ('queue_size', 'u32'), ('difficulty', 'str')]),
+    ('status', 'batch', [('messages', 'frames')]),
+]
+
+
+class FrameError(Exception):
+    pass
+
+
+def pack_board(board):
+    size = len(board)
+    packed = bytearray(1 + (size * size + 3) // 4)
+    packed[0] = size
+    i = 0
+    for row in board:
+        for cell in row:
+            code = CELL_CODES[cell]
+            if code:
+                packed[1 + (i >> 2)] |= code << ((i & 3) << 1)
+            i += 1
+    return bytes(packed)
+
+
+def unpack_board(data, offset):
+    size = data[offset]
+    start = offset + 1
+    board = []
+    i = 0
+    for _ in range(size):
+        row = []
+        for _ in range(size):
+            row.append(CELL_CHARS[(data[start + (i >> 2)] >> ((i & 3) << 1)) & 3])
+            i += 1
+        board.append(row)
+    return board, start + (size * size + 3) // 4
+
+
+def pack_str(value):
+    if value is None:
+        return STRING_LENGTH.pack(NONE_STRING)
+    encoded = str(value).encode('utf-8')
+    if len(encoded) >= NONE_STRING:
+        raise FrameError(f"String of {len(encoded)} bytes is too long")
+    return STRING_LENGTH.pack(len(encoded)) + encoded
+
+
+def unpack_str(data, offset):
+    (length,) = STRING_LENGTH.unpack_from(data, offset)
+    offset += STRING_LENGTH.size
+    if length == NONE_STRING:
+        return None, offset
+    return bytes(data[offset:offset + length]).decode('utf-8'), offset + length
+
+
+def pack_field(kind, value):
+    if kind == 'str':
+        return pack_str('' if value is None else value)
+    if kind == 'opt_str':
+        return pack_str(value)
+    if kind == 'board':
+        return pack_board(value or [])
+    if kind == 'sizes':
+        return bytes([len(value)]) + bytes(value)
+    if kind == 'placements':
+        packed = bytearray([len(value)])
+        for ship in value:
+            row, col = ship['start_pos']
+            packed += bytes((ship['size'], ORIENTATIONS.index(ship['orientation']), row, col))
+        return bytes(packed)
+    if kind == 'frames':
+        parts = [STRING_LENGTH.pack(len(value))]
+        for frame in value:
+            parts.append(STRING_LENGTH.pack(len(frame) - BATCH_ENTRY_OFFSET))
+            parts.append(frame[BATCH_ENTRY_OFFSET:])
+        return b''.join(parts)
+    if kind == 'scoreboard':
+        parts = [STRING_LENGTH.pack(len(value))]
+        for entry in value:
+            parts.append(pack_str(entry['name']))
+            parts.append(SCORE_ENTRY.pack(entry['wins']))
+        return b''.join(parts)
+    raise FrameError(f"Unknown field kind: {kind}")
+
+
+def unpack_field(kind, data, offset):
+    if kind in ('str', 'opt_str'):
+        return unpack_str(data, offset)
+    if kind == 'board':
+        return unpack_board(data, offset)
+    if kind == 'sizes':
+        count = data[offset]
+        return list(data[offset + 1:offset + 1 + count]), offset + 1 + count
+    if kind == 'placements':
+        count = data[offset]
+        offset += 1
+        ships = []
+        for _ in range(count):
+            size, orientation, row, col = data[offset:offset + 4]
+            ships.append({'size': size, 'orientation': ORIENTATIONS[orientation], 'start_pos': (row, col)})
+            offset += 4
+        return ships, offset
+    if kind == 'frames':
+        (count,) = STRING_LENGTH.unpack_from(data, offset)
+        offset += STRING_LENGTH.size
+        messages = []
+        for _ in range(count):
+            (length,) = STRING_LENGTH.unpack_from(data, offset)
+            start = offset + STRING_LENGTH.size
+            if not length or start + length > len(data) or data[start] >= len(LAYOUTS_BY_ID):
+                raise FrameError("Malformed entry in batch")
+            messages.append(LAYOUTS_BY_ID[data[start]].decode(data[:start + length], start + 1))
+            offset = start + length
+        return messages, offset
+    if kind == 'scoreboard':
+        (count,) = STRING_LENGTH.unpack_from(data, offset)
+        offset += STRING_LENGTH.size
+        entries = []
+        for _ in range(count):
+            name, offset = unpack_str(data, offset)
+            (wins,) = SCORE_ENTRY.unpack_from(data, offset)
+            offset += SCORE_ENTRY.size
+            entries.append({'name': name, 'wins': wins})
+        return entries, offset
+    raise FrameError(f"Unknown field kind: {kind}")
+
+
+class MessageLayout:
+    """
+    Układ jednego typu wiadomości. Sąsiednie pola o stałej długości pakowane są
+    jednym prekompilowanym struct.Struct, więc np. strzał to kilka bajtów i jedno pack().
+    """
+    def __init__(self, type_id, key, name, fields):
+        self.type_id = type_id
+        self.key = key
+        self.name = name
+        self.segments = []
+        fixed = []
+        for field_name, kind in fields:
+            if kind in FIXED_FIELDS:
+                fixed.append((field_name, kind))
+                continue
+            if fixed:
+                self.segments.append(self._fixed_segment(fixed))
+                fixed = []
+            self.segments.append(('var', field_name, kind))
+        if fixed:
+            self.segments.append(self._fixed_segment(fixed))
+
+    def _fixed_segment(self, fields):
+        layout = struct.Struct('!' + ''.join(FIXED_FIELDS[kind] for _, kind in fields))
+        return ('fixed', fields, layout)
+
+    def encode(self, message):
+        parts = [FRAME_HEADER.pack(0, PROTOCOL_VERSION, self.type_id)]
+        for segment in self.segments:
+            if segment[0] == 'fixed':
+                _, fields, layout = segment
+                values = []
+                for field_name, kind in fields:
+                    value = message.get(field_name)
+                    values.append(RESULTS.index(value) if kind == 'result' else (value or 0))
+                parts.append(layout.pack(*values))
+            else:
+                _, field_name, kind = segment
+                parts.append(pack_field(kind, message.get(field_name)))
+        frame = bytearray(b''.join(parts))
+        LENGTH_PREFIX.pack_into(frame, 0, len(frame) - LENGTH_PREFIX.size)
+        return bytes(frame)
+
+    def decode(self, data, offset):
+        message = {self.key: self.name}
+        for segment in self.segments:
+            if segment[0] == 'fixed':
+                _, fields, layout = segment
+                values = layout.unpack_from(data, offset)
+                offset += layout.size
+                for (field_name, kind), value in zip(fields, values):
+                    message[field_name] = RESULTS[value] if kind == 'result' else value
+            else:
+                _, field_name, kind = segment
+                message[field_name], offset = unpack_field(kind, data, offset)
+        return message
+
+
+LAYOUTS_BY_ID = [MessageLayout(type_id, key, name, fields) for type_id, (key, name, fields) in enumerate(MESSAGE_TYPES)]
+LAYOUTS_BY_NAME = {(layout.key, layout.name): layout for layout in LAYOUTS_BY_ID}
+
+
+def encode_frame(message):
+    if 'action' in message:
+        layout = LAYOUTS_BY_NAME.get(('action', message['action']))
+    else:
+        layout = LAYOUTS_BY_NAME.get(('status', message.get('status')))
+    if layout is None:
+        raise FrameError(f"Unknown message: {message.get('action') or message.get('status')}")
+    try:
+        return layout.encode(message)
+    except (struct.error, ValueError, KeyError, TypeError) as e:
+        raise FrameError(f"Cannot encode {layout.name}: {e}")
+
+
+def encode_batch(frames, max_frame_size=MAX_FRAME_SIZE):
+    """
+    Skleja już zakodowane ramki do jednego odbiorcy w ramki 'batch', które klient
+    aplikuje po kolei. Pojedyncza ramka idzie bez opakowania; zbyt dużą paczkę dzieli.
+    """
+    if len(frames) < 2:
+        return b''.join(frames)
+    limit = max_frame_size - FRAME_HEADER.size - STRING_LENGTH.size
+    chunks = [[]]
+    size = 0
+    for frame in frames:
+        if len(frame) - BATCH_ENTRY_OFFSET > MAX_BATCH_ENTRY:
+            chunks += [[frame], []]
+            size = 0
+            continue
+        if chunks[-1] and (size + len(frame) > limit or len(chunks[-1]) == MAX_BATCH_ENTRY):
+            chunks.append([])
+            size = 0
+        chunks[-1].append(frame)
+        size += len(frame)
+    return b''.join(chunk[0] if len(chunk) == 1 else encode_frame({'status': 'batch', 'messages': chunk})
+                    for chunk in chunks if chunk)
+
+
+def decode_frame(data):
+    if len(data) < FRAME_HEADER.size - LENGTH_PREFIX.size:
+        raise FrameError("Truncated frame")
+    version, type_id = data[0], data[1]
+    if version != PROTOCOL_VERSION:
+        raise FrameError(f"Unsupported protocol version {version}")
+    if type_id >= len(LAYOUTS_BY_ID):
+        raise FrameError(f"Unknown message type {type_id}")
+    try:
+        return LAYOUTS_BY_ID[type_id].decode(data, 2)
+    except (struct.error, IndexError, ValueError, UnicodeDecodeError) as e:
+        raise FrameError(f"Malformed {LAYOUTS_BY_ID[type_id].name} frame: {e}")
+
+
+class FrameDecoder:
+    """
+    Składa ramki (4-bajtowa długość + payload) z kolejnych kawałków strumienia TCP.
+    Jeden feed() może zwrócić wiele wiadomości albo żadnej, jeśli ramka jest niepełna.
+    """
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        buffer = self.buffer
+        buffer += data
+        messages = []
+        offset = 0
+        header_size = LENGTH_PREFIX.size
+        with memoryview(buffer) as view:
+            while len(buffer) - offset >= header_size:
+                (length,) = LENGTH_PREFIX.unpack_from(buffer, offset)
+                if length > self.max_frame_size:
+                    raise FrameError(f"Frame of {length} bytes exceeds limit of {self.max_frame_size}")
+                end = offset + header_size + length
+                if len(buffer) < end:
+                    break
+                messages.append(decode_frame(view[offset + header_size:end]))
+                offset = end
+        if offset:
+            del buffer[:offset]
+        return messages
+
+
+class FrameReader:
+    """
+    Czyta ramki z gniazda do jednego, wielokrotnie używanego bufora (recv_into).
+    """
+    def __init__(self, sock, buffer_size=BUFFER_SIZE, max_frame_size=MAX_FRAME_SIZE):
+        self.sock = sock
+        self.recv_buffer = bytearray(buffer_size)
+        self.recv_view = memoryview(self.recv_buffer)
+        self.decoder = FrameDecoder(max_frame_size)
+        self.pending = deque()
+
+    def receive(self):
+        received = self.sock.recv_into(self.recv_view)
+        if not received:
+            return None
+        return self.recv_view[:received]
+
+    def read_messages(self):
+        data = self.receive()
+        if data is None:
+            return None
+        return self.decoder.feed(data)
+
+    def read_message(self):
+        while not self.pending:
+            messages = self.read_messages()
+            if messages is None:
+                return None
+            self.pending.extend(messages)
+        return self.pending.popleft()